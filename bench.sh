@@ -0,0 +1 @@
+python3 src/benchmark.py site "$@"
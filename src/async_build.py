@@ -0,0 +1,116 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from content_generation import STREAM_THRESHOLD_BYTES, render_page, stream_page, write_if_changed
+from profiling import stage
+
+DEFAULT_IO_WORKERS = 16
+DEFAULT_QUEUE_SIZE = 64
+
+
+def _read_text(path):
+    with stage("read"):
+        if os.path.getsize(path) >= STREAM_THRESHOLD_BYTES:
+            # too large to hold in memory; the renderer streams it instead
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def _write_text(path, text):
+    with stage("write"):
+        return write_if_changed(path, text)
+
+
+async def generate_pages_async(pages, basepath, io_workers=DEFAULT_IO_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, cache=None):
+    """
+    Generate pages with reads, rendering and writes overlapped.
+
+    Args:
+        pages: list of (source_path, dest_path, template_path) triples
+        basepath: basepath the links are rewritten to
+        io_workers: reads and writes kept in flight at once, each on a
+            thread of a pool of that size
+        queue_size: bound on the pages waiting between two stages, which
+            caps memory however slow the filesystem or the renderer is
+        cache: optional RenderCache shared by every page
+
+    Returns:
+        (errors, written), as returned by generate_pages.
+
+    Reads feed a single renderer through a bounded queue, and the renderer
+    feeds the writers through another. Rendering is CPU bound and stays on
+    the event loop thread; file I/O runs in the thread pool, which releases
+    the GIL while it waits on the filesystem.
+    """
+    loop = asyncio.get_running_loop()
+    read_queue = asyncio.Queue(queue_size)
+    render_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    errors = []
+    written = []
+
+    async def reader(executor):
+        while (page := await read_queue.get()) is not None:
+            try:
+                md_content = await loop.run_in_executor(executor, _read_text, page[0])
+            except Exception as e:
+                errors.append((page[0], f"{type(e).__name__}: {e}"))
+                continue
+            await render_queue.put((page, md_content))
+
+    async def renderer():
+        while (item := await render_queue.get()) is not None:
+            (source_path, dest_path, template_path), md_content = item
+            print(f"Generating page from {source_path} to {dest_path} using {template_path}")
+            html = None
+            try:
+                with stage("generate_page", source_path):
+                    if md_content is not None:
+                        html = render_page(md_content, template_path, basepath, cache)
+                    else:
+                        with stage("stream"):
+                            if stream_page(source_path, template_path, dest_path, basepath):
+                                written.append(dest_path)
+            except Exception as e:
+                errors.append((source_path, f"{type(e).__name__}: {e}"))
+            if html is not None:
+                await write_queue.put((source_path, dest_path, html))
+            # queue.get() does not yield while items are waiting, so give
+            # the readers and writers a turn between pages
+            await asyncio.sleep(0)
+
+    async def writer(executor):
+        while (item := await write_queue.get()) is not None:
+            source_path, dest_path, html = item
+            try:
+                if await loop.run_in_executor(executor, _write_text, dest_path, html):
+                    written.append(dest_path)
+            except Exception as e:
+                errors.append((source_path, f"{type(e).__name__}: {e}"))
+
+    with ThreadPoolExecutor(max_workers=io_workers) as executor:
+        readers = [asyncio.create_task(reader(executor)) for _ in range(io_workers)]
+        writers = [asyncio.create_task(writer(executor)) for _ in range(io_workers)]
+        render_task = asyncio.create_task(renderer())
+
+        for page in pages:
+            await read_queue.put(page)
+        for _ in readers:
+            await read_queue.put(None)
+        await asyncio.gather(*readers)
+
+        await render_queue.put(None)
+        await render_task
+
+        for _ in writers:
+            await write_queue.put(None)
+        await asyncio.gather(*writers)
+
+    return errors, written
+
+
+def generate_pages_with_async_io(pages, basepath, io_workers=DEFAULT_IO_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, cache=None):
+    """Run generate_pages_async on a fresh event loop."""
+    return asyncio.run(generate_pages_async(pages, basepath, io_workers, queue_size, cache))
@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from content_generation import extract_title, find_content_pages
+from inline_markdown import split_text_to_textnodes, text_to_textnodes
+from markdown_blocks import BlockType, block_to_block_type, markdown_to_blocks, markdown_to_html_node
+from templates import load_template
+
+SITE_SCALES = {"small": 100, "medium": 10_000, "large": 100_000}
+PAGES_PER_DIRECTORY = 100
+# pages bench_site carries through the stages at once
+BENCH_CHUNK_PAGES = 500
+SITE_STAGES = (
+    "read",
+    "markdown_to_blocks",
+    "block_to_block_type",
+    "text_to_textnodes",
+    "markdown_to_html_node",
+    "to_html",
+    "template",
+    "write",
+)
+SITE_TEMPLATE = """<!DOCTYPE html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+INLINE_FRAGMENTS = [
+    "The quick brown fox jumps over the lazy dog. ",
+    "**bold statement** ",
+    "_quiet emphasis_ ",
+    "`render(page)` ",
+    "[a link](https://example.com/page) ",
+    "![an image](/images/picture.png) ",
+    "plain prose with no markup at all, just words and punctuation; ",
+]
+
+
+def inline_paragraphs(count, fragments_per_paragraph=40, seed=0):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(INLINE_FRAGMENTS) for _ in range(fragments_per_paragraph))
+        for _ in range(count)
+    ]
+
+
+def time_call(func, inputs, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_inline(paragraphs=2000, repeat=5):
+    inputs = inline_paragraphs(paragraphs)
+    multipass = time_call(split_text_to_textnodes, inputs, repeat)
+    single_pass = time_call(text_to_textnodes, inputs, repeat)
+    print(f"inline tokenizer, {paragraphs} inline-heavy paragraphs (best of {repeat}):")
+    print(f"  five-pass split pipeline: {multipass * 1000:8.1f} ms")
+    print(f"  single-pass scanner:      {single_pass * 1000:8.1f} ms")
+    print(f"  speedup:                  {multipass / single_pass:8.2f}x")
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.children:
+            stack.extend(node.children)
+    return count
+
+
+def bench_memory(paragraphs=2000):
+    inputs = inline_paragraphs(paragraphs)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    text_nodes = [text_to_textnodes(text) for text in inputs]
+    after = tracemalloc.take_snapshot()
+    text_node_bytes = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    text_node_count = sum(len(nodes) for nodes in text_nodes)
+    del text_nodes
+
+    markdown = "\n\n".join(inputs)
+    before = tracemalloc.take_snapshot()
+    tree = markdown_to_html_node(markdown)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    html_node_bytes = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    html_node_count = count_nodes(tree)
+
+    # the byte counts include the node text, which is the same before and after
+    print(f"node memory, {paragraphs} inline-heavy paragraphs:")
+    print(f"  TextNode: {text_node_count:8d} nodes {text_node_bytes / text_node_count:8.1f} bytes/node")
+    print(f"  HTMLNode: {html_node_count:8d} nodes {html_node_bytes / html_node_count:8.1f} bytes/node")
+
+
+def synthetic_page(rng, number):
+    """A markdown page with a fixed mix of headings, lists, code, quotes, links, images and emphasis."""
+    blocks = [f"# Page {number}"]
+    for section in range(rng.randint(2, 4)):
+        blocks.append(f"## Section {section + 1} of page {number}")
+        blocks.append(" ".join(inline_paragraphs(1, rng.randint(10, 30), rng.random())))
+        kind = rng.randrange(4)
+        if kind == 0:
+            items = inline_paragraphs(rng.randint(3, 8), 3, rng.random())
+            blocks.append("\n".join(f"- {item.strip()}" for item in items))
+        elif kind == 1:
+            items = inline_paragraphs(rng.randint(3, 8), 3, rng.random())
+            blocks.append("\n".join(f"{i + 1}. {item.strip()}" for i, item in enumerate(items)))
+        elif kind == 2:
+            blocks.append("```\ndef render(page):\n    return page.to_html()\n```")
+        else:
+            blocks.append("\n".join(f"> {line.strip()}" for line in inline_paragraphs(2, 6, rng.random())))
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_synthetic_site(root, pages, seed=0):
+    """
+    Write a content/ tree of the given number of pages and a template.html under root.
+
+    Pages are spread over directories of PAGES_PER_DIRECTORY pages each,
+    every page in its own folder as in the real site. The same seed
+    always produces the same site.
+    """
+    rng = random.Random(seed)
+    for number in range(pages):
+        page_dir = os.path.join(
+            root, "content", f"section-{number // PAGES_PER_DIRECTORY}", f"page-{number}"
+        )
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, "index.md"), "w", encoding="utf-8") as f:
+            f.write(synthetic_page(rng, number))
+    with open(os.path.join(root, "template.html"), "w", encoding="utf-8") as f:
+        f.write(SITE_TEMPLATE)
+
+
+def _inline_texts(block):
+    # the inline text each block renderer hands to text_to_textnodes
+    block_type = block_to_block_type(block)
+    lines = block.split("\n")
+    if block_type == BlockType.HEADING:
+        return [block.lstrip("#").strip()]
+    if block_type == BlockType.PARAGRAPH:
+        return [" ".join(lines)]
+    if block_type == BlockType.QUOTE:
+        return [" ".join(line.lstrip(">").strip() for line in lines)]
+    if block_type in (BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST):
+        return [line.split(" ", 1)[1] for line in lines if " " in line]
+    return []
+
+
+def bench_site(pages, seed=0, chunk_pages=BENCH_CHUNK_PAGES):
+    """
+    Build a synthetic site of the given size and time every pipeline stage separately.
+
+    Pages go through the stages chunk_pages at a time and only the time
+    spent in each stage is kept, so memory stays bounded at any site size
+    and does not skew the timings.
+    """
+    stages = dict.fromkeys(SITE_STAGES, 0.0)
+    block_count = inline_count = 0
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        stages[name] += time.perf_counter() - start
+        return result
+
+    def read_sources(chunk):
+        sources = []
+        for source_path, _, _ in chunk:
+            with open(source_path, "r", encoding="utf-8") as f:
+                sources.append(f.read())
+        return sources
+
+    def render_templates(chunk, sources, fragments):
+        return [
+            load_template(template_path, "/").render({"Title": extract_title(md), "Content": html})
+            for (_, _, template_path), md, html in zip(chunk, sources, fragments)
+        ]
+
+    def write_outputs(chunk, outputs):
+        for (_, dest_path, _), html in zip(chunk, outputs):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, "w", encoding="utf-8") as f:
+                f.write(html)
+
+    with tempfile.TemporaryDirectory() as root:
+        generate_synthetic_site(root, pages, seed)
+        site = find_content_pages(
+            os.path.join(root, "content"), os.path.join(root, "docs"), os.path.join(root, "template.html")
+        )
+        for first in range(0, len(site), chunk_pages):
+            chunk = site[first:first + chunk_pages]
+            sources = timed("read", lambda: read_sources(chunk))
+            documents = timed("markdown_to_blocks", lambda: [markdown_to_blocks(md) for md in sources])
+            blocks = [block for document in documents for block in document]
+            timed("block_to_block_type", lambda: [block_to_block_type(block) for block in blocks])
+            inline = [text for block in blocks for text in _inline_texts(block)]
+            timed("text_to_textnodes", lambda: [text_to_textnodes(text) for text in inline])
+            trees = timed("markdown_to_html_node", lambda: [markdown_to_html_node(md) for md in sources])
+            fragments = timed("to_html", lambda: [tree.to_html() for tree in trees])
+            outputs = timed("template", lambda: render_templates(chunk, sources, fragments))
+            timed("write", lambda: write_outputs(chunk, outputs))
+            block_count += len(blocks)
+            inline_count += len(inline)
+
+    # markdown_to_html_node covers the block and inline stages again as one
+    # pass, so the per-page total counts it instead of its parts
+    build_seconds = sum(
+        stages[name] for name in ("read", "markdown_to_html_node", "to_html", "template", "write")
+    )
+    return {
+        "pages": pages,
+        "blocks": block_count,
+        "inline_texts": inline_count,
+        "stages": stages,
+        "build_seconds": build_seconds,
+        "pages_per_second": pages / build_seconds if build_seconds else 0.0,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Print each stage against the baseline run with the same page count.
+
+    Returns the list of (pages, stage, ratio) regressions slower than
+    1 + tolerance.
+    """
+    regressions = []
+    baseline_runs = {run["pages"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = baseline_runs.get(run["pages"])
+        if old is None:
+            print(f"no baseline for {run['pages']} pages")
+            continue
+        print(f"{run['pages']} pages vs baseline:")
+        for stage, seconds in run["stages"].items():
+            if stage not in old["stages"] or old["stages"][stage] == 0:
+                continue
+            ratio = seconds / old["stages"][stage]
+            flag = "  REGRESSION" if ratio > 1 + tolerance else ""
+            print(f"  {stage:22s} {old['stages'][stage]:9.3f}s -> {seconds:9.3f}s  x{ratio:5.2f}{flag}")
+            if flag:
+                regressions.append((run["pages"], stage, ratio))
+    return regressions
+
+
+def run_site_benchmarks(args):
+    scales = [SITE_SCALES.get(scale) or int(scale) for scale in args.scales]
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "runs": [],
+    }
+    for pages in scales:
+        run = bench_site(pages, args.seed)
+        results["runs"].append(run)
+        print(f"site benchmark, {pages} pages ({run['blocks']} blocks):")
+        for stage, seconds in run["stages"].items():
+            print(f"  {stage:22s} {seconds:9.3f}s")
+        print(f"  {'pages/s':22s} {run['pages_per_second']:9.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_to_baseline(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the site generator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    site = subparsers.add_parser("site", help="time each build stage on synthetic sites")
+    site.add_argument(
+        "scales",
+        nargs="*",
+        default=["small"],
+        help="page counts, or small (100), medium (10k) and large (100k)",
+    )
+    site.add_argument("--seed", type=int, default=0)
+    site.add_argument("--output", metavar="JSON", help="write the results to this file")
+    site.add_argument("--baseline", metavar="JSON", help="compare against results saved with --output")
+    site.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.10,
+        help="slowdown against the baseline reported as a regression (default 0.10)",
+    )
+
+    inline = subparsers.add_parser("inline", help="single-pass vs five-pass inline tokenizer")
+    inline.add_argument("--paragraphs", type=int, default=2000)
+    inline.add_argument("--repeat", type=int, default=5)
+
+    memory = subparsers.add_parser("memory", help="bytes per TextNode and HTMLNode")
+    memory.add_argument("--paragraphs", type=int, default=2000)
+
+    args = parser.parse_args()
+    if args.command == "site":
+        return run_site_benchmarks(args)
+    if args.command == "inline":
+        bench_inline(args.paragraphs, args.repeat)
+    elif args.command == "memory":
+        bench_memory(args.paragraphs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
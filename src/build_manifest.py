@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 2
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def empty_manifest(basepath):
+    return {
+        "version": MANIFEST_VERSION,
+        "basepath": basepath,
+        "templates": {},
+        "pages": {},
+        "static": {},
+        "assets": {},
+        "images": {},
+        "minify": False,
+        "compress": False,
+    }
+
+
+def references_path(path):
+    """The file next to the manifest at path that holds each page's references."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.references{extension}"
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def _write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _page_references(manifest):
+    return {source_path: entry["references"] for source_path, entry in manifest["pages"].items() if "references" in entry}
+
+
+def load_manifest(path):
+    """
+    Load the manifest written by the previous build.
+
+    Returns None when there is no usable manifest, which callers treat
+    as "rebuild everything". Page references are read back from their
+    own file, see save_manifest, unless it is not the one the manifest
+    was saved with; pages are then left without references.
+    """
+    manifest = _read_json(path)
+    if manifest is None:
+        return None
+    saved = _read_json(references_path(path))
+    digest = manifest.get("references_digest")
+    if saved is None or digest is None or saved.get("digest") != digest:
+        manifest.pop("references_digest", None)
+        return manifest
+    for source_path, paths in saved["pages"].items():
+        entry = manifest["pages"].get(source_path)
+        if entry is not None:
+            entry["references"] = paths
+    return manifest
+
+
+def save_manifest(path, manifest, previous=None):
+    """
+    Write manifest to path.
+
+    The references of the pages, which make up much of a large site's
+    manifest and rarely change, go to the file named by references_path,
+    written first and under a digest the manifest records, so a crash
+    between the two writes cannot pair the manifest with other
+    references. That file is kept as it is when the references are
+    those of previous, the manifest loaded or saved last, and it is
+    still there.
+    """
+    pages = {}
+    references = {}
+    for source_path, entry in manifest["pages"].items():
+        if "references" in entry:
+            references[source_path] = entry["references"]
+            entry = dict(entry)
+            del entry["references"]
+        pages[source_path] = entry
+
+    digest = None
+    if (
+        previous is not None
+        and previous.get("references_digest") is not None
+        and os.path.exists(references_path(path))
+        and _page_references(previous) == references
+    ):
+        digest = previous["references_digest"]
+    if digest is None:
+        # json.dumps, unlike json.dump, runs the C encoder
+        data = json.dumps(references, separators=(",", ":"))
+        digest = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        _write_text(
+            references_path(path),
+            f'{{"version":{MANIFEST_VERSION},"digest":"{digest}","pages":{data}}}',
+        )
+    manifest["references_digest"] = digest
+    _write_text(path, json.dumps({**manifest, "pages": pages}, separators=(",", ":")))
+
+
+def _renamed_assets(old_names, names):
+    # every name a page may link a renamed asset by: its plain path and both hashed names
+    linked = set()
+    for path in old_names.keys() | names.keys():
+        if old_names.get(path) != names.get(path):
+            linked.add(os.path.normpath(path))
+            for published in (old_names.get(path), names.get(path)):
+                if published is not None:
+                    linked.add(os.path.normpath(published))
+    return linked
+
+
+def _restyled_images(old_images, images, names):
+    # pages link to an image by its plain path, or by its hashed name when fingerprinted
+    linked = set()
+    for path in old_images.keys() | images.keys():
+        if old_images.get(path, {}).get("attributes") != images.get(path, {}).get("attributes"):
+            linked.add(os.path.normpath(path))
+            published = names.get(path.replace(os.sep, "/"))
+            if published is not None:
+                linked.add(os.path.normpath(published))
+    return linked
+
+
+def plan_incremental_build(pages, previous, basepath, changed=None, assets=None, images=None, minify=False):
+    """
+    Work out which pages need regenerating.
+
+    Args:
+        pages: list of (source_path, dest_path, template_path) triples
+            found in content/
+        previous: manifest from the last build, or None
+        basepath: basepath of this build
+        changed: optional set of paths known to have changed since
+            previous; when given, other sources and templates are assumed
+            unchanged and are not re-hashed
+        assets: published names of the fingerprinted static files, see
+            fingerprint.asset_names; pages linking to a file whose name
+            changed are rebuilt
+        images: entries of the image stage, see
+            image_optimization.optimize_images; pages showing an image
+            whose img attributes changed are rebuilt
+        minify: whether pages are minified; switching it rebuilds them all
+
+    Returns:
+        (to_build, stale_outputs, manifest) where to_build is the list of
+        pages to regenerate, stale_outputs the outputs whose sources are
+        gone and manifest the manifest describing this build.
+    """
+    manifest = empty_manifest(basepath)
+    manifest["assets"] = assets or {}
+    manifest["images"] = images or {}
+    manifest["minify"] = minify
+    rebuild_all = (
+        previous is None
+        or previous.get("basepath") != basepath
+        or previous.get("minify", False) != minify
+    )
+    renamed = set()
+    if previous is not None:
+        renamed = _renamed_assets(previous.get("assets", {}), manifest["assets"])
+        renamed |= _restyled_images(previous.get("images", {}), manifest["images"], manifest["assets"])
+    old_pages = {} if previous is None else previous["pages"]
+    old_templates = {} if previous is None else previous["templates"]
+    if rebuild_all:
+        changed = None
+
+    templates = manifest["templates"]
+    for _, _, template_path in pages:
+        if template_path not in templates:
+            if changed is not None and template_path not in changed and template_path in old_templates:
+                templates[template_path] = old_templates[template_path]
+            else:
+                templates[template_path] = hash_file(template_path)
+
+    to_build = []
+    for source_path, dest_path, template_path in pages:
+        old = old_pages.get(source_path)
+        if changed is not None and source_path not in changed and old is not None:
+            source_hash = old["hash"]
+        else:
+            source_hash = hash_file(source_path)
+        dest_path = str(dest_path)
+        manifest["pages"][source_path] = {
+            "hash": source_hash,
+            "output": dest_path,
+            "template": template_path,
+        }
+        if old is not None and "references" in old:
+            # the site paths the output links to, refreshed when it is rewritten
+            manifest["pages"][source_path]["references"] = old["references"]
+        if (
+            rebuild_all
+            or old is None
+            or old["hash"] != source_hash
+            or old["output"] != dest_path
+            or old["template"] != template_path
+            or old_templates.get(template_path) != templates[template_path]
+            or (changed is None and not os.path.exists(dest_path))
+            or (renamed and not renamed.isdisjoint(old.get("references", renamed)))
+        ):
+            to_build.append((source_path, dest_path, template_path))
+
+    current_outputs = {entry["output"] for entry in manifest["pages"].values()}
+    stale_outputs = []
+    for source_path, entry in old_pages.items():
+        current = manifest["pages"].get(source_path)
+        # covers both removed sources and pages whose output path moved
+        if current is None or current["output"] != entry["output"]:
+            if entry["output"] not in current_outputs:
+                stale_outputs.append(entry["output"])
+
+    return to_build, stale_outputs, manifest
+
+
+def remove_file_and_empty_parents(path, root):
+    """
+    Delete the file at path, then the directories under root it leaves empty.
+
+    Returns:
+        True if the file was deleted, False if it was already gone.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    root = os.path.abspath(root)
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent != root and parent.startswith(root) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+    return True
+
+
+def remove_stale_outputs(paths, dest_root):
+    """Delete outputs whose sources are gone, plus any directories left empty."""
+    for path in paths:
+        if remove_file_and_empty_parents(path, dest_root):
+            print(f"Removed stale output {path}")
@@ -0,0 +1,181 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    # without brotli only .gz sidecars are written
+    brotli = None
+
+COMPRESSED_EXTENSIONS = (".html", ".css")
+SIDECAR_SUFFIXES = (".gz", ".br")
+# smaller files gain next to nothing, and the headers can make them bigger
+DEFAULT_MIN_BYTES = 1024
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# files handed to a worker process at a time
+CHUNK_SIZE = 64
+
+
+def brotli_available():
+    return brotli is not None
+
+
+def sidecar_suffixes():
+    """Suffixes of the sidecars compress_outputs writes next to each file."""
+    return SIDECAR_SUFFIXES if brotli is not None else (".gz",)
+
+
+def compress_data(data, suffix):
+    if suffix == ".gz":
+        # mtime=0 leaves the build time out of the header, so unchanged pages compress the same
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def _compress_files(tasks):
+    """
+    Write the sidecars of each (path, suffixes) in tasks; runs in the worker processes.
+
+    A sidecar is given the mtime of its source, which is how the next
+    build tells it is still up to date.
+
+    Returns:
+        (suffix, bytes_in, bytes_out) for every sidecar written.
+    """
+    results = []
+    for path, suffixes in tasks:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            continue
+        for suffix in suffixes:
+            compressed = compress_data(data, suffix)
+            sidecar_path = path + suffix
+            tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                os.replace(tmp_path, sidecar_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            results.append((suffix, len(data), len(compressed)))
+    return results
+
+
+def _is_sidecar(name):
+    base, suffix = os.path.splitext(name)
+    return suffix in SIDECAR_SUFFIXES and os.path.splitext(base)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _scan(docs_dir, suffixes, min_bytes):
+    # (path, stale suffixes) of the files to compress, and counts of what was left alone or removed
+    tasks = []
+    unchanged = small = removed = 0
+    pending = [docs_dir]
+    while pending:
+        dir_path = pending.pop()
+        with os.scandir(dir_path) as it:
+            entries = {}
+            for entry in it:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                else:
+                    entries[entry.name] = entry
+        for name, entry in entries.items():
+            if _is_sidecar(name):
+                base, suffix = os.path.splitext(name)
+                # its page is gone, or it is a .br no longer written and so no longer kept current
+                if base not in entries or suffix not in suffixes:
+                    removed += _remove(entry.path)
+                continue
+            if os.path.splitext(name)[1].lower() not in COMPRESSED_EXTENSIONS:
+                continue
+            stat = entry.stat()
+            if stat.st_size < min_bytes:
+                small += 1
+                for suffix in suffixes:
+                    if name + suffix in entries:
+                        removed += _remove(entries[name + suffix].path)
+                continue
+            stale = []
+            for suffix in suffixes:
+                sidecar = entries.get(name + suffix)
+                if sidecar is None or sidecar.stat().st_mtime_ns != stat.st_mtime_ns:
+                    stale.append(suffix)
+            if stale:
+                tasks.append((entry.path, tuple(stale)))
+            else:
+                unchanged += 1
+    return tasks, unchanged, small, removed
+
+
+def compress_outputs(docs_dir, jobs=1, min_bytes=DEFAULT_MIN_BYTES):
+    """
+    Write precompressed .gz sidecars, and .br ones when brotli is installed, next to the html and css in docs_dir.
+
+    Servers such as nginx with gzip_static then send a sidecar as it is
+    rather than compressing the page again for every request.
+
+    Args:
+        docs_dir: the built site
+        jobs: worker processes compressing files at once
+        min_bytes: files smaller than this are left uncompressed, and
+            any sidecars they had are removed
+
+    Returns:
+        (written, unchanged, removed): files whose sidecars were written,
+        files whose sidecars still match them and sidecars removed,
+        because their file is gone or now too small. A file keeps its
+        mtime when a build leaves it unchanged, see write_if_changed,
+        so its sidecars are not compressed again.
+    """
+    suffixes = sidecar_suffixes()
+    tasks, unchanged, small, removed = _scan(docs_dir, suffixes, min_bytes)
+
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    if jobs <= 1 or len(chunks) <= 1:
+        results = [_compress_files(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_compress_files, chunks))
+
+    totals = {suffix: [0, 0] for suffix in suffixes}
+    for chunk_results in results:
+        for suffix, bytes_in, bytes_out in chunk_results:
+            totals[suffix][0] += bytes_in
+            totals[suffix][1] += bytes_out
+    print(
+        f"Compressed {len(tasks)} files: {unchanged} unchanged, {small} under {min_bytes} bytes left alone, "
+        f"{removed} sidecars removed"
+    )
+    for suffix, (bytes_in, bytes_out) in totals.items():
+        if bytes_in:
+            print(f"  {suffix}: {bytes_in} bytes down to {bytes_out} ({100 * bytes_out / bytes_in:.1f}%)")
+    if brotli is None:
+        print("  brotli is not installed: only .gz sidecars were written")
+    return len(tasks), unchanged, removed
+
+
+def remove_sidecars(docs_dir):
+    """Delete every sidecar compress_outputs wrote in docs_dir; returns how many were removed."""
+    removed = 0
+    for dir_path, _, file_names in os.walk(docs_dir):
+        for file_name in file_names:
+            if _is_sidecar(file_name):
+                removed += _remove(os.path.join(dir_path, file_name))
+    return removed
@@ -1,41 +1,163 @@
+import filecmp
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from markdown_blocks import markdown_to_html_node
+from inline_memo import active_inline_memo, enable_inline_memo
+from markdown_blocks import iter_block_html_nodes
+from minify import HtmlMinifier, active_minification, enable_minification, render_minified_page
+from profiling import active_profiler, enable_profiling, stage
+from render_cache import render_markdown
+from templates import TEMPLATE_OVERRIDE_NAME, active_asset_names, load_template, directory_template, rewrite_links, set_asset_names
+from textnode import active_image_attributes, set_image_attributes
+
+# sources at least this large are streamed to disk block by block
+STREAM_THRESHOLD_BYTES = 1024 * 1024
 
 def extract_title(markdown):
-    lines = markdown.split("\n")
+    return _title_from_lines(markdown.split("\n"))
+
+def _title_from_lines(lines):
     for line in lines:
         if line.startswith("# "):
             new_line = line[2:]
             return new_line.strip()
     raise Exception("markdown has no valid title heading")
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def render_page(md_content, template_path, basepath, cache=None):
+    """Render a page's markdown into its template and return the full html document."""
+    template = load_template(template_path, basepath)
+
+    html_string = render_markdown(md_content, cache)
+    title_page = extract_title(md_content)
+
+    values = {"Title": title_page, "Content": html_string}
+    if active_minification() is not None:
+        return render_minified_page(template, values)
+    with stage("template"):
+        return template.render(values)
+
+def write_if_changed(path, content):
+    """
+    Write content to path unless the file there already holds exactly that.
+
+    An unchanged file keeps its mtime, so rsync, CDN syncs and browser
+    caches see nothing to do. A changed file is written to a temporary
+    name and renamed over the old one, so readers never see it half written.
+
+    Returns:
+        True if the file was written, False if it was left alone.
+    """
+    data = content.encode("utf-8")
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+class _MinifyingWriter:
+    # passes what stream_page writes through an HtmlMinifier on its way to the file
+    def __init__(self, out):
+        self.out = out
+        self.minifier = HtmlMinifier()
+        self.chars_in = 0
+        self.chars_out = 0
 
+    def write(self, text):
+        minified = self.minifier.feed(text)
+        self.chars_in += len(text)
+        self.chars_out += len(minified)
+        self.out.write(minified)
+
+    def finish(self):
+        minified = self.minifier.finish()
+        self.chars_out += len(minified)
+        self.out.write(minified)
+
+def stream_page(from_path, template_path, dest_path, basepath):
+    """
+    Render a large page straight to disk, one markdown block at a time.
+
+    The source is read twice, once for its title and once for its blocks,
+    and each block's html goes into the output file as soon as it is
+    rendered. Only one block is ever held in memory, instead of the whole
+    markdown, node tree and html. Like write_if_changed, the page is
+    written to a temporary file and only moved into place if it differs.
+
+    Returns:
+        True if the file at dest_path was written.
+    """
+    template = load_template(template_path, basepath)
     with open(from_path, "r", encoding="utf-8") as f:
-        md_content = f.read()
+        title = _title_from_lines(f)
+    segments = template.render_around({"Title": title}, "Content")
+    if segments is None:
+        # a template using the content more than once needs it as a string
+        with open(from_path, "r", encoding="utf-8") as f:
+            return write_if_changed(dest_path, render_page(f.read(), template_path, basepath))
 
-    with open(template_path, 'r', encoding="utf-8") as f:
-        html_content = f.read()
-    
-    html_string = markdown_to_html_node(md_content).to_html()
-    title_page = extract_title(md_content)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(from_path, "r", encoding="utf-8") as f, open(tmp_path, "w", encoding="utf-8") as out:
+            stats = active_minification()
+            if stats is not None:
+                out = _MinifyingWriter(out)
+            out.write(segments[0])
+            out.write("<div>")
+            for node in iter_block_html_nodes(f):
+                out.write(rewrite_links(node.to_html(), basepath))
+            out.write("</div>")
+            out.write(segments[1])
+            if stats is not None:
+                out.finish()
+                stats.add(1, out.chars_in, out.chars_out)
+        if os.path.exists(dest_path) and filecmp.cmp(tmp_path, dest_path, shallow=False):
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
 
-    new_content = html_content.replace("{{ Title }}", title_page)
-    new_content = new_content.replace("{{ Content }}", html_string)
-    new_content = new_content.replace('href="/', 'href="' + basepath)
-    new_content = new_content.replace('src="/', 'src="' + basepath)
+def generate_page(from_path, template_path, dest_path, basepath, cache=None):
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
 
-    dir_path = os.path.dirname(dest_path)
-    os.makedirs(dir_path, exist_ok=True)
+    with stage("generate_page", from_path):
+        if os.path.getsize(from_path) >= STREAM_THRESHOLD_BYTES:
+            with stage("stream"):
+                return stream_page(from_path, template_path, dest_path, basepath)
 
-    with open(dest_path, "w", encoding="utf-8") as f:
-        f.write(new_content)
+        with stage("read"):
+            with open(from_path, "r", encoding="utf-8") as f:
+                md_content = f.read()
 
-def generate_page_recursively(dir_path_content, template_path, dest_dir_path, basepath):
-    
+        new_content = render_page(md_content, template_path, basepath, cache)
+
+        with stage("write"):
+            return write_if_changed(dest_path, new_content)
+
+def generate_page_recursively(dir_path_content, template_path, dest_dir_path, basepath, cache=None):
+    """Generate every page under dir_path_content and return how many files were written."""
+    written = 0
     contents = os.listdir(dir_path_content)
+    template_path = directory_template(dir_path_content, template_path)
     
     for content in contents:
         content_path = os.path.join(dir_path_content, content)
@@ -45,20 +167,131 @@ def generate_page_recursively(dir_path_content, template_path, dest_dir_path, ba
                 rel_content_path = os.path.relpath(content_path, dir_path_content)
                 dest_path = os.path.join(dest_dir_path, rel_content_path)
                 dest_path = Path(dest_path).with_suffix(".html")
-                generate_page(content_path, template_path, dest_path, basepath) 
-               
+                written += generate_page(content_path, template_path, dest_path, basepath, cache)
 
         elif os.path.isdir(content_path):
             rel_content_path = os.path.relpath(content_path, dir_path_content)
             dest_path = os.path.join(dest_dir_path, rel_content_path)
-            generate_page_recursively(content_path, template_path, dest_path, basepath)
+            written += generate_page_recursively(content_path, template_path, dest_path, basepath, cache)
+    return written
 
+def find_content_pages(dir_path_content, dest_dir_path, template_path):
+    """
+    List every markdown source under dir_path_content as a
+    (source_path, dest_path, template_path) triple. A template.html inside
+    a content directory overrides template_path for that directory and below.
+    """
+    pages = []
+    pending = [(dir_path_content, dest_dir_path, template_path)]
+    while pending:
+        dir_path, dest_path, template_path = pending.pop()
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+        for entry in entries:
+            if entry.name == TEMPLATE_OVERRIDE_NAME and entry.is_file():
+                template_path = entry.path
 
+        subdirs = []
+        for entry in entries:
+            if entry.is_file():
+                stem, extension = os.path.splitext(entry.name)
+                if extension == ".md":
+                    pages.append((entry.path, os.path.join(dest_path, stem + ".html"), template_path))
+            elif entry.is_dir():
+                subdirs.append((entry.path, os.path.join(dest_path, entry.name), template_path))
+        pending.extend(reversed(subdirs))
+    return pages
 
+def _generate_page_chunk(chunk, basepath, cache):
+    errors = []
+    written = []
+    for source_path, dest_path, template_path in chunk:
+        try:
+            if generate_page(source_path, template_path, dest_path, basepath, cache):
+                written.append(dest_path)
+        except Exception as e:
+            errors.append((source_path, f"{type(e).__name__}: {e}"))
+    return errors, written
 
+def _generate_page_chunk_in_worker(
+    chunk, basepath, cache, profile, inline_memo_bytes, asset_names, image_attributes, minify
+):
+    # worker processes time their own pages and hand the events back, and
+    # keep an inline memo and minification counters of their own, which are
+    # added to ours
+    if profile:
+        enable_profiling()
+    set_asset_names(asset_names)
+    set_image_attributes(image_attributes)
+    memo = enable_inline_memo(inline_memo_bytes) if inline_memo_bytes else None
+    hits, misses = (memo.hits, memo.misses) if memo else (0, 0)
+    stats = enable_minification() if minify else None
+    minified = (stats.pages, stats.bytes_in, stats.bytes_out) if stats else (0, 0, 0)
+    errors, written = _generate_page_chunk(chunk, basepath, cache)
+    events = active_profiler().drain() if profile else []
+    memo_counts = (memo.hits - hits, memo.misses - misses) if memo else (0, 0)
+    if stats:
+        minified = (stats.pages - minified[0], stats.bytes_in - minified[1], stats.bytes_out - minified[2])
+    return errors, written, events, memo_counts, minified
 
+def generate_pages(pages, basepath, jobs=1, chunk_size=None, cache=None):
+    """
+    Generate every (source_path, dest_path, template_path) triple in pages.
 
+    Args:
+        pages: list of pages, as returned by find_content_pages
+        basepath: basepath the links are rewritten to
+        jobs: number of worker processes, 1 renders in this process
+        chunk_size: pages handed to a worker at once, defaults to a
+            few chunks per worker
+        cache: optional RenderCache shared by every page
 
+    Returns:
+        (errors, written): errors lists (source_path, error message) for
+        the pages that failed, and a failing page does not stop the others
+        from being generated. written lists the dest_path of every page
+        whose file actually changed; pages rendered to the same html as
+        before are not rewritten.
+    """
+    if jobs <= 1 or len(pages) <= 1:
+        return _generate_page_chunk(pages, basepath, cache)
 
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(pages) // (jobs * 4)))
+    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
 
-    
+    profiler = active_profiler()
+    memo = active_inline_memo()
+    stats = active_minification()
+    errors = []
+    written = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                _generate_page_chunk_in_worker,
+                chunk,
+                basepath,
+                cache,
+                profiler is not None,
+                memo.max_bytes if memo is not None else 0,
+                active_asset_names(),
+                active_image_attributes(),
+                stats is not None,
+            )
+            for chunk in chunks
+        ]
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_errors, chunk_written, events, (hits, misses), minified = future.result()
+                errors.extend(chunk_errors)
+                written.extend(chunk_written)
+                if profiler is not None:
+                    profiler.events.extend(events)
+                if memo is not None:
+                    memo.hits += hits
+                    memo.misses += misses
+                if stats is not None:
+                    stats.add(*minified)
+            except Exception as e:
+                errors.extend((source_path, f"{type(e).__name__}: {e}") for source_path, _, _ in chunk)
+    return errors, written
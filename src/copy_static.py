@@ -1,33 +1,237 @@
+import errno
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def delete_destination_contents(path):
-    for item in os.listdir(path):
-        item_path = os.path.join(path, item)
+from build_manifest import hash_file, remove_file_and_empty_parents
+
+# unlinks and copies mostly wait on the kernel, but extra threads only add
+# contention once every core is busy
+DEFAULT_COPY_WORKERS = min(8, os.cpu_count() or 1)
+
+def _run_file_ops(op, items, workers):
+    """Apply op to every item, on a pool of workers threads when workers > 1, and sum the sizes it returns."""
+    if workers <= 1 or len(items) <= 1:
+        return sum(op(*item) for item in items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(lambda item: op(*item), items))
+
+def _report_throughput(action, files, total_bytes, seconds):
+    seconds = max(seconds, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(
+        f"{action} {files} files ({megabytes:.1f} MB) in {seconds:.3f}s: "
+        f"{files / seconds:.0f} files/s, {megabytes / seconds:.1f} MB/s"
+    )
+
+def _delete_entry(entry):
+    try:
+        size = entry.stat(follow_symlinks=False).st_size
+        os.remove(entry.path)
+        return size
+    except Exception as e:
+        print(f"Error deleting {entry.path}: {e}")
+        return 0
+
+def delete_destination_contents(path, workers=DEFAULT_COPY_WORKERS):
+    """
+    Delete everything inside path, leaving path itself in place.
+
+    Args:
+        path: directory to empty
+        workers: number of threads unlinking files at once
+
+    The tree is walked with os.scandir, without recursion, so depth is
+    not limited by the interpreter's recursion limit. Symbolic links are
+    removed, never followed. Returns a summary with the files and bytes
+    deleted and the time taken.
+    """
+    start = time.perf_counter()
+    files = []
+    dirs = []
+    pending = [path]
+    while pending:
+        dir_path = pending.pop()
         try:
-            if os.path.isfile(item_path) or os.path.islink(item_path):
-                os.remove(item_path)
-            elif os.path.isdir(item_path):
-                delete_destination_contents(item_path)
-                if not os.listdir(item_path):
-                    os.rmdir(item_path)
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                        pending.append(entry.path)
+                    else:
+                        files.append((entry,))
         except Exception as e:
-            print(f"Error deleting {item_path}: {e}")
+            print(f"Error deleting {dir_path}: {e}")
 
-def copy_source_content_to_destination(path, destination):
-    for item in os.listdir(path):
-        item_path = os.path.join(path, item)
-        new_subdir = os.path.join(destination, item)
-        print(f"DEBUG copying {item_path} -> {destination}")
+    total_bytes = _run_file_ops(_delete_entry, files, workers)
+
+    # every directory was listed after its parent, so children go first
+    for dir_path in reversed(dirs):
         try:
-            if os.path.isfile(item_path): 
-                shutil.copy(item_path, destination)
+            os.rmdir(dir_path)
+        except OSError as e:
+            if e.errno != errno.ENOTEMPTY:
+                print(f"Error deleting {dir_path}: {e}")
+
+    summary = {"files": len(files), "bytes": total_bytes, "seconds": time.perf_counter() - start}
+    _report_throughput("Deleted", summary["files"], summary["bytes"], summary["seconds"])
+    return summary
+
+def _copy_entry(entry, destination):
+    try:
+        shutil.copy(entry.path, destination)
+        return entry.stat().st_size
+    except Exception as e:
+        print(f"Error copying {entry.path}: {e}")
+        return 0
 
-            elif os.path.isdir(item_path):
-                if not os.path.exists(new_subdir):
-                    os.mkdir(new_subdir)
+def copy_source_content_to_destination(path, destination, workers=DEFAULT_COPY_WORKERS):
+    """
+    Copy everything inside path into destination.
 
-                copy_source_content_to_destination(item_path, new_subdir)
+    Args:
+        path: source directory, e.g. static/
+        destination: existing directory the files are copied into
+        workers: number of threads copying files at once
 
+    Directories are created while the tree is walked and the file copies
+    are then shared out across the thread pool. Returns a summary with
+    the files and bytes copied and the time taken.
+    """
+    start = time.perf_counter()
+    files = []
+    pending = [(path, destination)]
+    while pending:
+        dir_path, dest_dir = pending.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    new_path = os.path.join(dest_dir, entry.name)
+                    if entry.is_file():
+                        files.append((entry, new_path))
+                    elif entry.is_dir():
+                        if not os.path.exists(new_path):
+                            os.mkdir(new_path)
+                        pending.append((entry.path, new_path))
         except Exception as e:
-            print(f"Error copying {item_path}: {e}")
\ No newline at end of file
+            print(f"Error copying {dir_path}: {e}")
+
+    total_bytes = _run_file_ops(_copy_entry, files, workers)
+
+    summary = {"files": len(files), "bytes": total_bytes, "seconds": time.perf_counter() - start}
+    _report_throughput("Copied", summary["files"], summary["bytes"], summary["seconds"])
+    return summary
+
+def _copy_contents(source, destination):
+    with open(source, "rb") as fsrc, open(destination, "wb") as fdst:
+        if hasattr(os, "copy_file_range"):
+            # in-kernel copy, which filesystems such as btrfs and xfs turn into a reflink
+            size = os.fstat(fsrc.fileno()).st_size
+            copied = 0
+            try:
+                while copied < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+            if copied == size:
+                return
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst)
+
+def _copy_file(source, destination, use_links):
+    # never write through an existing file: it may be a hard link to the source
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if use_links:
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass
+    _copy_contents(source, destination)
+    shutil.copystat(source, destination)
+
+def sync_source_content_to_destination(
+    path, destination, previous_files=None, checksum=False, use_links=False, skip=()
+):
+    """
+    Bring destination in line with path, copying only what changed.
+
+    Args:
+        path: source directory, e.g. static/
+        destination: directory the files are copied into
+        previous_files: the files returned by the previous sync; those no
+            longer in path are deleted from destination
+        checksum: also compare file contents when size and mtime match
+        use_links: hard link files instead of copying them where possible
+        skip: relative paths another stage publishes; they are recorded
+            in files but not copied
+
+    Returns:
+        (files, summary): files maps each relative path to its size,
+        mtime and, in checksum mode, content hash; summary counts the
+        files copied, skipped and deleted.
+    """
+    previous_files = previous_files or {}
+    files = {}
+    summary = {"copied": 0, "skipped": 0, "deleted": 0, "bytes_copied": 0}
+
+    for dir_path, _, file_names in os.walk(path):
+        rel_dir = os.path.relpath(dir_path, path)
+        dest_dir = os.path.normpath(os.path.join(destination, rel_dir))
+        os.makedirs(dest_dir, exist_ok=True)
+        for file_name in file_names:
+            item_path = os.path.join(dir_path, file_name)
+            dest_path = os.path.join(dest_dir, file_name)
+            rel_path = os.path.normpath(os.path.join(rel_dir, file_name))
+            try:
+                stat = os.stat(item_path)
+                entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                old = previous_files.get(rel_path)
+
+                unchanged = False
+                try:
+                    dest_stat = os.stat(dest_path)
+                    unchanged = (
+                        dest_stat.st_size == stat.st_size
+                        and dest_stat.st_mtime_ns == stat.st_mtime_ns
+                        # a link left by an earlier use_links sync is replaced by a real copy
+                        and (use_links or not os.path.samestat(stat, dest_stat))
+                    )
+                except FileNotFoundError:
+                    pass
+
+                if checksum:
+                    if old and old.get("hash") and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+                        entry["hash"] = old["hash"]
+                    else:
+                        entry["hash"] = hash_file(item_path)
+                    if unchanged:
+                        unchanged = hash_file(dest_path) == entry["hash"]
+
+                if unchanged or rel_path in skip:
+                    summary["skipped"] += 1
+                else:
+                    _copy_file(item_path, dest_path, use_links)
+                    summary["copied"] += 1
+                    summary["bytes_copied"] += stat.st_size
+                files[rel_path] = entry
+            except Exception as e:
+                print(f"Error copying {item_path}: {e}")
+
+    for rel_path in previous_files:
+        if rel_path not in files:
+            if remove_file_and_empty_parents(os.path.join(destination, rel_path), destination):
+                summary["deleted"] += 1
+
+    print(
+        f"Static sync: {summary['copied']} copied ({summary['bytes_copied']} bytes), "
+        f"{summary['skipped']} skipped, {summary['deleted']} deleted"
+    )
+    return files, summary
@@ -0,0 +1,116 @@
+import os
+import re
+from collections import defaultdict
+from urllib.parse import unquote
+
+_reference_re = re.compile(r'(?:src|href)="([^"]*)"')
+
+
+def local_references(html, basepath):
+    """
+    List the site paths an html page refers to with src= or href=.
+
+    Args:
+        html: the generated page
+        basepath: basepath the page's links were rewritten to
+
+    Returns:
+        sorted paths relative to the site root, such as images/a.png;
+        links to other sites are left out. Whether a path is a static
+        file is decided when the graph is queried, so a page linking to a
+        file added later still gets its edge.
+    """
+    found = set()
+    for url in _reference_re.findall(html):
+        if not url.startswith(basepath):
+            continue
+        path = url[len(basepath):].split("#", 1)[0].split("?", 1)[0]
+        if path:
+            found.add(os.path.normpath(unquote(path)))
+    return sorted(found)
+
+
+def record_page_references(manifest, pages, written):
+    """
+    Store in the manifest what each of pages refers to, read from its generated output.
+
+    Args:
+        manifest: manifest of the build that generated pages
+        pages: the (source_path, dest_path, template_path) triples generated
+        written: outputs that were actually rewritten; the others still
+            link to what they did and are only read when the manifest has
+            no record of them yet
+    """
+    written = set(written)
+    for source_path, dest_path, _ in pages:
+        entry = manifest["pages"].get(source_path)
+        if entry is None or (dest_path not in written and "references" in entry):
+            continue
+        try:
+            with open(dest_path, "r", encoding="utf-8") as f:
+                html = f.read()
+        except FileNotFoundError:
+            continue
+        entry["references"] = local_references(html, manifest["basepath"])
+
+
+class DependencyGraph:
+    def __init__(self, manifest, static_dir, docs_dir):
+        """
+        The build's dependencies, as recorded in the manifest of the last build.
+
+        Args:
+            manifest: manifest written by an incremental build
+            static_dir: directory the manifest's static paths are relative to
+            docs_dir: directory static files are copied into
+
+        Edges run from each source to its output, from each template to
+        the pages rendered with it and from each static file to the pages
+        that link to it.
+        """
+        self.static_dir = os.path.normpath(static_dir)
+        self.docs_dir = docs_dir
+        self.outputs = {}
+        self.template_pages = defaultdict(list)
+        self.asset_pages = defaultdict(list)
+        self.static_files = set(manifest["static"])
+        self.static_outputs = {path: entry["output"] for path, entry in manifest["static"].items() if "output" in entry}
+        # pages link to fingerprinted files by their published names
+        published = {
+            os.path.normpath(name): os.path.normpath(path) for path, name in manifest.get("assets", {}).items()
+        }
+        for source_path, entry in manifest["pages"].items():
+            source_path = os.path.normpath(source_path)
+            self.outputs[source_path] = entry["output"]
+            self.template_pages[os.path.normpath(entry["template"])].append(source_path)
+            for path in entry.get("references", ()):
+                path = published.get(path, path)
+                if path in self.static_files:
+                    self.asset_pages[path].append(source_path)
+
+    def affected_by(self, path):
+        """
+        Work out what a change to path would cost.
+
+        Returns:
+            (kind, rebuilt, referencing): kind is "page", "template",
+            "static" or "unknown"; rebuilt lists the outputs regenerated or
+            copied again; referencing lists the pages that link to a static
+            file, which only its own copy has to follow unless the file is
+            fingerprinted and its new name makes them rebuild too.
+        """
+        path = os.path.normpath(path)
+        if path in self.outputs:
+            return "page", [self.outputs[path]], []
+        if path in self.template_pages:
+            return "template", sorted(self.outputs[source] for source in self.template_pages[path]), []
+
+        rel_path = os.path.relpath(path, self.static_dir)
+        if not rel_path.startswith(os.pardir) and rel_path in self.static_files:
+            referencing = sorted(self.asset_pages.get(rel_path, ()))
+            if rel_path in self.static_outputs:
+                rebuilt = [os.path.join(self.docs_dir, self.static_outputs[rel_path])]
+                rebuilt += sorted(self.outputs[source] for source in referencing)
+                return "static", rebuilt, referencing
+            return "static", [os.path.join(self.docs_dir, rel_path)], referencing
+        return "unknown", [], []
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+
+from build_manifest import hash_file, remove_file_and_empty_parents
+
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+ASSET_MANIFEST_VERSION = 1
+HASH_LENGTH = 8
+# pages are linked to by their own names, so they keep them
+_unhashed_extensions = (".html", ".htm")
+
+
+def fingerprinted_name(rel_path, digest):
+    """index.css hashed to 3fa2c1... becomes index.3fa2c1d0.css, in the same directory."""
+    stem, extension = os.path.splitext(rel_path)
+    if extension.lower() in _unhashed_extensions:
+        return rel_path
+    return f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def load_asset_manifest(docs_dir):
+    """Entries of the asset manifest in docs_dir, or {} when there is none."""
+    try:
+        with open(os.path.join(docs_dir, ASSET_MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != ASSET_MANIFEST_VERSION:
+        return {}
+    return manifest["assets"]
+
+
+def save_asset_manifest(docs_dir, assets):
+    path = os.path.join(docs_dir, ASSET_MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": ASSET_MANIFEST_VERSION, "assets": assets}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def asset_names(assets):
+    """Map the url path of each static file to the one it is published under, for the ones that were renamed."""
+    return {
+        rel_path.replace(os.sep, "/"): entry["output"].replace(os.sep, "/")
+        for rel_path, entry in assets.items()
+        if entry.get("output", rel_path) != rel_path
+    }
+
+
+def fingerprint_static(static_dir, docs_dir, previous=None):
+    """
+    Publish every file of static_dir into docs_dir under a content-hashed name.
+
+    Args:
+        static_dir: source directory, e.g. static/
+        docs_dir: directory the files are published into
+        previous: asset manifest entries of the last run; files whose
+            size and mtime are unchanged keep their hash instead of being
+            read again, and outputs no longer produced are deleted
+
+    Returns:
+        asset manifest entries, mapping each path relative to static_dir
+        to its size, mtime, hash and the output path relative to docs_dir.
+
+    A hashed name only ever holds one content, so an output that already
+    exists is left alone and pages can be served with immutable caching.
+    """
+    previous = previous or {}
+    assets = {}
+    rehashed = copied = deleted = 0
+
+    pending = [static_dir]
+    while pending:
+        dir_path = pending.pop()
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+        for entry in entries:
+            if entry.is_dir():
+                pending.append(entry.path)
+                continue
+            rel_path = os.path.relpath(entry.path, static_dir)
+            stat = entry.stat()
+            old = previous.get(rel_path)
+            unchanged = old is not None and (old["size"], old["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+            if unchanged and old.get("hash"):
+                digest = old["hash"]
+            else:
+                digest = hash_file(entry.path)
+                rehashed += 1
+            output = fingerprinted_name(rel_path, digest)
+            assets[rel_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest, "output": output}
+
+            dest_path = os.path.join(docs_dir, output)
+            unchanged_copy = old is not None and old.get("hash") == digest and old.get("output") == output
+            if not (unchanged_copy and os.path.exists(dest_path)):
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                # pages keep their plain name, which a --static-links build hard linked to static/
+                if os.path.lexists(dest_path):
+                    os.remove(dest_path)
+                shutil.copy2(entry.path, dest_path)
+                copied += 1
+
+    current_outputs = {entry["output"] for entry in assets.values()}
+    for rel_path, entry in previous.items():
+        # entries from a plain sync have no output of their own: they were copied under rel_path
+        output = entry.get("output", rel_path)
+        if output not in current_outputs:
+            if remove_file_and_empty_parents(os.path.join(docs_dir, output), docs_dir):
+                deleted += 1
+
+    save_asset_manifest(docs_dir, assets)
+    print(f"Fingerprinted {len(assets)} static files: {rehashed} hashed, {copied} copied, {deleted} removed")
+    return assets
+
+
+def remove_fingerprinted_outputs(docs_dir, assets):
+    """Delete what fingerprint_static published, once the files go back to their plain names."""
+    for rel_path, entry in assets.items():
+        if entry.get("output", rel_path) != rel_path:
+            remove_file_and_empty_parents(os.path.join(docs_dir, entry["output"]), docs_dir)
+    try:
+        os.remove(os.path.join(docs_dir, ASSET_MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
@@ -1,6 +1,10 @@
+import sys
 from typing import Optional
 
 class HTMLNode:
+    # nodes are created by the hundred thousand, so keep them dict-free
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
         self,
         tag: Optional[str] = None,
@@ -15,16 +19,21 @@ class HTMLNode:
             tag: HTML tag name (e.g., 'div', 'p')
             value: Text content of the node
             children: List of child HTMLNode objects
-            props: Dictionary of HTML attributes
+            props: Dictionary of HTML attributes, None when there are none
         """
 
-        self.tag = tag
+        # interned so every node with the same tag shares one string
+        self.tag = sys.intern(tag) if tag is not None else None
         self.value = value
         self.children = children
         self.props = props
 
     def to_html(self):
         raise NotImplementedError("to_html method not implemented")
+
+    def write_html(self, sink):
+        """Write the serialized node to sink, any object with a write(str) method."""
+        sink.write(self.to_html())
     
     def props_to_html(self):
         if self.props is None:
@@ -35,6 +44,7 @@ class HTMLNode:
         return f"HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})" 
         
 class LeafNode(HTMLNode):
+    __slots__ = ()
 
     def __init__(
         self,
@@ -67,6 +77,8 @@ class LeafNode(HTMLNode):
     
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag: str,
@@ -88,13 +100,28 @@ class ParentNode(HTMLNode):
     
 
     def to_html(self):
-        if self.tag is None:
-            raise ValueError("invalid HTML: no tag")
-        if self.children is None:
-            raise ValueError("invalid HTML: no children")
-        
-        c_to_html = ""
-        for c in self.children:
-            c_to_html += f"{c.to_html()}"
-            
-        return f"<{self.tag}{self.props_to_html()}>{c_to_html}</{self.tag}>"
\ No newline at end of file
+        fragments = []
+        self._write_fragments(fragments.append)
+        return "".join(fragments)
+
+    def write_html(self, sink):
+        self._write_fragments(sink.write)
+
+    def _write_fragments(self, write):
+        # walk the tree with an explicit stack so deep trees never hit the
+        # recursion limit; closing tags are pushed as plain strings
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                write(node)
+            elif isinstance(node, ParentNode):
+                if node.tag is None:
+                    raise ValueError("invalid HTML: no tag")
+                if node.children is None:
+                    raise ValueError("invalid HTML: no children")
+                write(f"<{node.tag}{node.props_to_html()}>")
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
+            else:
+                write(node.to_html())
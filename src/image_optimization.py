@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from build_manifest import hash_file, remove_file_and_empty_parents
+
+try:
+    from PIL import Image
+except ImportError:
+    # without Pillow images are published as they are, and only PNG sizes are known
+    Image = None
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+DEFAULT_WIDTHS = (480, 960)
+DEFAULT_CACHE_DIR = "./.cache/images"
+JPEG_QUALITY = 85
+# bump when the encoding changes, so images cached by an older version are encoded again
+IMAGE_CACHE_VERSION = "1"
+_png_signature = b"\x89PNG\r\n\x1a\n"
+
+
+def pillow_available():
+    return Image is not None
+
+
+def find_images(static_dir):
+    """Paths relative to static_dir of the images the image stage publishes."""
+    found = []
+    pending = [static_dir]
+    while pending:
+        dir_path = pending.pop()
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    found.append(os.path.relpath(entry.path, static_dir))
+    return sorted(found)
+
+
+def png_size(path):
+    """(width, height) read from the header of a PNG file, or None for anything else."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != _png_signature or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def variant_name(rel_path, width):
+    """images/tom.png scaled to 480 pixels wide becomes images/tom-480w.png."""
+    stem, extension = os.path.splitext(rel_path)
+    return f"{stem}-{width}w{extension}"
+
+
+def _cache_entry_dir(cache_dir, digest, widths):
+    key = f"{IMAGE_CACHE_VERSION}\0{digest}\0{','.join(str(width) for width in widths)}"
+    return os.path.join(cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+
+def _save(image, path, image_format):
+    if image_format == "PNG":
+        image.save(path, format="PNG", optimize=True)
+    else:
+        image.save(path, format=image_format, quality=JPEG_QUALITY, optimize=True)
+
+
+def _encode_image(source_path, entry_dir, widths):
+    """
+    Encode source_path and its narrower variants into entry_dir; runs in the worker processes.
+
+    Returns:
+        {"width", "height", "variants"}: the size of the image and the
+        widths of the variants made, those of widths below it whose file
+        came out smaller than the original.
+    """
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    extension = os.path.splitext(source_path)[1].lower()
+    with Image.open(source_path) as image:
+        image.load()
+        image_format = image.format
+        width, height = image.size
+        original_path = os.path.join(tmp_dir, f"original{extension}")
+        if image_format == "PNG":
+            # same pixels, only compressed harder; kept if it is any smaller
+            _save(image, original_path, image_format)
+            if os.path.getsize(original_path) >= os.path.getsize(source_path):
+                shutil.copyfile(source_path, original_path)
+        else:
+            # re-encoding a JPEG would lose quality, so the original is kept as it is
+            shutil.copyfile(source_path, original_path)
+
+        if image.mode == "P":
+            # palette images can only be resized with nearest neighbour
+            image = image.convert("RGBA")
+        variants = []
+        for variant_width in sorted(set(widths)):
+            if variant_width >= width:
+                continue
+            variant_height = max(1, round(height * variant_width / width))
+            resized = image.resize((variant_width, variant_height), Image.LANCZOS)
+            variant_path = os.path.join(tmp_dir, f"{variant_width}w{extension}")
+            _save(resized, variant_path, image_format)
+            if os.path.getsize(variant_path) >= os.path.getsize(original_path):
+                # resampling can leave less to compress; a variant that weighs more is no use
+                os.remove(variant_path)
+                continue
+            variants.append(variant_width)
+
+    meta = {"width": width, "height": height, "variants": variants}
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # another build cached the same image first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return meta
+
+
+def _load_cached(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _publish(cached_path, dest_path):
+    # copy2 keeps the cached file's mtime, so an unchanged copy is recognised by its stat
+    cached_stat = os.stat(cached_path)
+    try:
+        dest_stat = os.stat(dest_path)
+        if (dest_stat.st_size, dest_stat.st_mtime_ns) == (cached_stat.st_size, cached_stat.st_mtime_ns):
+            return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    # never write through an existing file: a --static-links build leaves hard links to static/ here
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    shutil.copy2(cached_path, dest_path)
+    return True
+
+
+def _url(rel_path):
+    return "/" + rel_path.replace(os.sep, "/")
+
+
+def optimize_images(
+    static_dir,
+    docs_dir,
+    published=None,
+    previous=None,
+    widths=DEFAULT_WIDTHS,
+    cache_dir=DEFAULT_CACHE_DIR,
+    jobs=1,
+):
+    """
+    Publish the images of static_dir re-encoded, along with narrower variants of them.
+
+    Args:
+        static_dir: source directory, e.g. static/
+        docs_dir: directory the images are published into
+        published: maps the url path of a static file to the one it is
+            published under, see fingerprint.asset_names
+        previous: entries returned by the last run; images whose size and
+            mtime are unchanged keep their hash instead of being read
+            again, and variants no longer produced are deleted
+        widths: widths in pixels of the variants, each made for the
+            images wider than it
+        cache_dir: encoded images are kept here, keyed by the hash of
+            their source, so an image is only ever encoded once
+        jobs: worker processes encoding images at once
+
+    Returns:
+        entries mapping each image path relative to static_dir to its
+        size, mtime, hash, the variants published and the attributes
+        its img tags get, see image_attributes.
+
+    Without Pillow nothing is encoded: images are left to the static
+    copy and PNGs still get their width and height.
+    """
+    published = published or {}
+    previous = previous or {}
+    images = {}
+    to_encode = []
+
+    for rel_path in find_images(static_dir):
+        source_path = os.path.join(static_dir, rel_path)
+        stat = os.stat(source_path)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "variants": [], "attributes": {}}
+        images[rel_path] = entry
+        if Image is None:
+            size = png_size(source_path)
+            if size is not None:
+                entry["attributes"] = {"width": str(size[0]), "height": str(size[1])}
+            continue
+
+        old = previous.get(rel_path)
+        if old is not None and old.get("hash") and (old["size"], old["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            entry["hash"] = old["hash"]
+        else:
+            entry["hash"] = hash_file(source_path)
+        entry_dir = _cache_entry_dir(cache_dir, entry["hash"], widths)
+        if _load_cached(entry_dir) is None:
+            to_encode.append((rel_path, source_path, entry_dir))
+
+    encoded = failed = copied = 0
+    if to_encode:
+        os.makedirs(cache_dir, exist_ok=True)
+        results = []
+        if jobs <= 1 or len(to_encode) <= 1:
+            for rel_path, source_path, entry_dir in to_encode:
+                try:
+                    results.append((rel_path, _encode_image(source_path, entry_dir, widths)))
+                except Exception as e:
+                    results.append((rel_path, e))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [
+                    (rel_path, executor.submit(_encode_image, source_path, entry_dir, widths))
+                    for rel_path, source_path, entry_dir in to_encode
+                ]
+                for rel_path, future in futures:
+                    try:
+                        results.append((rel_path, future.result()))
+                    except Exception as e:
+                        results.append((rel_path, e))
+        for rel_path, result in results:
+            if isinstance(result, Exception):
+                # the plain copy made by the static step stays in place
+                print(f"Error optimizing {rel_path}: {type(result).__name__}: {result}")
+                del images[rel_path]["hash"]
+                failed += 1
+            else:
+                encoded += 1
+
+    for rel_path, entry in images.items():
+        if Image is None:
+            continue
+        url_path = rel_path.replace(os.sep, "/")
+        output = published.get(url_path, url_path).replace("/", os.sep)
+        if "hash" not in entry:
+            # could not be encoded, so it is published as it is
+            copied += _publish(os.path.join(static_dir, rel_path), os.path.join(docs_dir, output))
+            continue
+        entry_dir = _cache_entry_dir(cache_dir, entry["hash"], widths)
+        meta = _load_cached(entry_dir)
+        extension = os.path.splitext(rel_path)[1].lower()
+        copied += _publish(os.path.join(entry_dir, f"original{extension}"), os.path.join(docs_dir, output))
+        candidates = []
+        for variant_width in meta["variants"]:
+            variant = variant_name(output, variant_width)
+            variant_path = os.path.join(entry_dir, f"{variant_width}w{extension}")
+            copied += _publish(variant_path, os.path.join(docs_dir, variant))
+            entry["variants"].append(variant)
+            candidates.append(f"{_url(variant)} {variant_width}w")
+
+        entry["attributes"] = {"width": str(meta["width"]), "height": str(meta["height"])}
+        if candidates:
+            candidates.append(f"{_url(output)} {meta['width']}w")
+            entry["attributes"]["srcset"] = ", ".join(candidates)
+            entry["attributes"]["sizes"] = f"(max-width: {meta['width']}px) 100vw, {meta['width']}px"
+
+    variants = {variant for entry in images.values() for variant in entry["variants"]}
+    deleted = remove_image_variants(docs_dir, previous, keep=variants)
+
+    if Image is None:
+        print(f"Pillow is not installed: {len(images)} images published as they are, with their sizes only")
+    else:
+        print(
+            f"Optimized {len(images)} images: {encoded} encoded, {failed} failed, "
+            f"{copied} files copied, {deleted} removed"
+        )
+    return images
+
+
+def remove_image_variants(docs_dir, images, keep=()):
+    """Delete the variants recorded in images, except those in keep; returns how many were removed."""
+    deleted = 0
+    for entry in images.values():
+        for variant in entry.get("variants", ()):
+            if variant not in keep and remove_file_and_empty_parents(os.path.join(docs_dir, variant), docs_dir):
+                deleted += 1
+    return deleted
+
+
+def image_attributes(images):
+    """Map the url of each image, as pages link to it, to the attributes of its img tags."""
+    return {_url(rel_path): entry["attributes"] for rel_path, entry in images.items() if entry["attributes"]}
@@ -1,6 +1,12 @@
 import re
 from textnode import TextNode, TextType
 
+_image_re = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_link_re = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_standalone_link_re = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+# characters that can start inline markup; "*" and "!" need a second look
+_inline_start_re = re.compile(r"[*_`\[]")
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     result = []
 
@@ -8,6 +14,9 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
         if old_node.text_type != TextType.TEXT:
             result.append(old_node)
+        elif delimiter not in old_node.text:
+            if old_node.text != "":
+                result.append(old_node)
         else:
             parts = old_node.text.split(delimiter)
 
@@ -27,11 +36,15 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return result
 
 def extract_markdown_links(text):
-    matches = re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "[" not in text:
+        return []
+    matches = _standalone_link_re.findall(text)
     return matches
 
 def extract_markdown_images(text):
-    matches = re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "![" not in text:
+        return []
+    matches = _image_re.findall(text)
     return matches
 
 def split_nodes_image(old_nodes):
@@ -99,7 +112,82 @@ def split_nodes_link(old_nodes):
 
     return new_nodes
 
+_delimiter_types = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+
+def _has_inline_markup(text):
+    # a few substring checks run far faster than any regex over plain prose
+    return "[" in text or "_" in text or "`" in text or "**" in text
+
+def _delimited_node(inner, text_type):
+    if text_type == TextType.CODE or not _has_inline_markup(inner):
+        return TextNode(inner, text_type)
+    try:
+        children = text_to_textnodes(inner)
+    except Exception:
+        # unbalanced markup inside emphasis stays literal, as it always has
+        return TextNode(inner, text_type)
+    if len(children) == 1 and children[0].text_type == TextType.TEXT:
+        return TextNode(inner, text_type)
+    return TextNode(inner, text_type, children=children)
+
 def text_to_textnodes(text):
+    """
+    Split inline markdown into TextNodes in a single left-to-right scan.
+
+    Produces the same nodes as split_text_to_textnodes for markup that
+    does not nest. Bold and italic spans may also contain other inline
+    markup, which is returned as the children of the emphasis node.
+    Code spans, links and images are never parsed further.
+    """
+    if not _has_inline_markup(text):
+        return [TextNode(text, TextType.TEXT)] if text else []
+
+    nodes = []
+    literal_start = 0
+    position = 0
+    while True:
+        match = _inline_start_re.search(text, position)
+        if match is None:
+            break
+        start = match.start()
+        token = text[start]
+        if token == "*":
+            if not text.startswith("**", start):
+                position = start + 1
+                continue
+            token = "**"
+        elif token == "[" and start > position and text[start - 1] == "!":
+            start -= 1
+            token = "!["
+        token_end = start + len(token)
+
+        if token[-1] == "[":
+            found = (_image_re if token == "![" else _link_re).match(text, start)
+            if found is None:
+                position = token_end
+                continue
+            if literal_start < start:
+                nodes.append(TextNode(text[literal_start:start], TextType.TEXT))
+            text_type = TextType.IMAGE if token == "![" else TextType.LINK
+            nodes.append(TextNode(found.group(1), text_type, found.group(2)))
+            position = literal_start = found.end()
+            continue
+
+        end = text.find(token, token_end)
+        if end == -1:
+            raise Exception("Invalid markdown syntax. Maybe close the delimiter?")
+        if literal_start < start:
+            nodes.append(TextNode(text[literal_start:start], TextType.TEXT))
+        if end > token_end:
+            nodes.append(_delimited_node(text[token_end:end], _delimiter_types[token]))
+        position = literal_start = end + len(token)
+
+    if literal_start < len(text):
+        nodes.append(TextNode(text[literal_start:], TextType.TEXT))
+    return nodes
+
+def split_text_to_textnodes(text):
+    """The original five-pass pipeline, kept as the reference text_to_textnodes is checked against."""
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
     nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# rough cost of an OrderedDict slot and its linked-list node, per entry
+_ENTRY_OVERHEAD = 100
+
+_memo = None
+
+
+class InlineMemo:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        In-memory LRU map from an inline markdown string to its rendered html.
+
+        Args:
+            max_bytes: estimated memory the entries may take, keys and
+                values included; the least recently used are dropped past it
+
+        Navigation lists, boilerplate lines and list items repeat verbatim
+        across pages, and rendering one again then costs a dict lookup.
+        Safe to share between threads, as the render server does.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pid = os.getpid()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def get(self, text):
+        with self._lock:
+            html = self._entries.get(text)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return html
+
+    def put(self, text, html):
+        size = sys.getsizeof(text) + sys.getsizeof(html) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(text, None)
+            if old is not None:
+                self._total_bytes -= sys.getsizeof(text) + sys.getsizeof(old) + _ENTRY_OVERHEAD
+            self._entries[text] = html
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                old_text, old_html = self._entries.popitem(last=False)
+                self._total_bytes -= sys.getsizeof(old_text) + sys.getsizeof(old_html) + _ENTRY_OVERHEAD
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0.0
+        print(
+            f"Inline memo: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{len(self._entries)} entries, {self._total_bytes / (1024 * 1024):.1f} of "
+            f"{self.max_bytes / (1024 * 1024):.0f} MB"
+        )
+
+
+def enable_inline_memo(max_bytes=DEFAULT_MAX_BYTES):
+    global _memo
+    # a forked worker starts with its own memo and counters
+    if _memo is None or _memo.pid != os.getpid():
+        _memo = InlineMemo(max_bytes)
+    return _memo
+
+
+def disable_inline_memo():
+    global _memo
+    _memo = None
+
+
+def active_inline_memo():
+    return _memo
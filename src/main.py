@@ -1,30 +1,489 @@
-from copy_static import delete_destination_contents, copy_source_content_to_destination
-from content_generation import generate_page_recursively
+from copy_static import delete_destination_contents, copy_source_content_to_destination, sync_source_content_to_destination, DEFAULT_COPY_WORKERS
+from content_generation import generate_page_recursively, generate_pages, find_content_pages
+from render_cache import RenderCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from build_manifest import load_manifest, save_manifest, plan_incremental_build, remove_stale_outputs
+from async_build import generate_pages_with_async_io
+from dependency_graph import DependencyGraph, record_page_references
+from watch import watch
+from profiling import enable_profiling, stage
+from inline_memo import active_inline_memo, enable_inline_memo, DEFAULT_MAX_BYTES as DEFAULT_INLINE_MEMO_BYTES
+from fingerprint import asset_names, fingerprint_static, load_asset_manifest, remove_fingerprinted_outputs
+from templates import set_asset_names
+from image_optimization import (
+    DEFAULT_CACHE_DIR as DEFAULT_IMAGE_CACHE_DIR,
+    DEFAULT_WIDTHS as DEFAULT_IMAGE_WIDTHS,
+    find_images,
+    image_attributes,
+    optimize_images,
+    pillow_available,
+    remove_image_variants,
+)
+from textnode import set_image_attributes
+from minify import active_minification, enable_minification, find_stylesheets, minify_static_css
+from compress import DEFAULT_MIN_BYTES as DEFAULT_COMPRESS_MIN_BYTES, compress_outputs, remove_sidecars
+import argparse
+import os
 import sys
+import time
 
 dir_path_static = "./static"
 dir_path_docs = "./docs"
 dir_path_content = "./content"
 template_path = "./template.html"
+manifest_path = "./.build_manifest.json"
 default_basepath = "/"
 
-def main():
-    basepath = sys.argv[1] if len(sys.argv) > 1 else default_basepath
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/")
+    parser.add_argument("basepath", nargs="?", default=default_basepath)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only regenerate pages whose source, template or basepath changed",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="build incrementally, then rebuild whatever changes under content/, static/ or the template",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=0.05,
+        metavar="SECONDS",
+        help="how often --watch polls for changes",
+    )
+    parser.add_argument(
+        "--static-checksum",
+        action="store_true",
+        help="with --incremental, compare static file contents, not just size and mtime",
+    )
+    parser.add_argument(
+        "--static-links",
+        action="store_true",
+        help="with --incremental, hard link static files into docs/ instead of copying",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="publish static files under content-hashed names and link pages to those",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        help="re-encode static images, publish narrower variants of them and give img tags sizes and a srcset "
+        "(needs Pillow; without it PNGs only get their sizes)",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=lambda value: tuple(int(width) for width in value.split(",")),
+        default=DEFAULT_IMAGE_WIDTHS,
+        metavar="W,W,...",
+        help=f"widths of the image variants (default {','.join(str(width) for width in DEFAULT_IMAGE_WIDTHS)})",
+    )
+    parser.add_argument(
+        "--image-cache",
+        default=DEFAULT_IMAGE_CACHE_DIR,
+        metavar="DIR",
+        help=f"where encoded images are kept between builds (default {DEFAULT_IMAGE_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="collapse the whitespace of generated pages and strip comments and whitespace from stylesheets",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write precompressed .gz copies of the html and css in docs/, and .br ones when brotli is installed",
+    )
+    parser.add_argument(
+        "--compress-min-bytes",
+        type=int,
+        default=DEFAULT_COMPRESS_MIN_BYTES,
+        metavar="BYTES",
+        help=f"with --compress, leave files smaller than this uncompressed (default {DEFAULT_COMPRESS_MIN_BYTES})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages across N worker processes, and encode images and compress files with as many; "
+        "with --async-io, which renders pages in one process, N only applies to images and compression",
+    )
+    parser.add_argument(
+        "--copy-workers",
+        type=int,
+        default=DEFAULT_COPY_WORKERS,
+        metavar="N",
+        help="threads deleting docs/ and copying static files at once",
+    )
+    parser.add_argument(
+        "--async-io",
+        type=int,
+        default=0,
+        metavar="N",
+        help="overlap reads, rendering and writes, keeping up to N file operations in flight; "
+        "pages are then rendered by this and not by --jobs",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage and print a report at the end",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages listed by --profile",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        metavar="JSON",
+        help="with --profile, also write a Chrome trace file for chrome://tracing",
+    )
+    parser.add_argument(
+        "--render-cache",
+        nargs="?",
+        const=DEFAULT_CACHE_DIR,
+        metavar="DIR",
+        help=f"reuse rendered markdown stored in DIR (default {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--render-cache-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        metavar="MB",
+        help="size the render cache is trimmed to",
+    )
+    parser.add_argument(
+        "--inline-memo",
+        nargs="?",
+        type=int,
+        const=DEFAULT_INLINE_MEMO_BYTES // (1024 * 1024),
+        metavar="MB",
+        help="reuse the html of inline text seen before, keeping at most MB megabytes of it "
+        f"(default {DEFAULT_INLINE_MEMO_BYTES // (1024 * 1024)})",
+    )
+    parser.add_argument(
+        "--what-rebuilds",
+        nargs="+",
+        metavar="PATH",
+        help="list what a change to each PATH would rebuild, from the last --incremental build, and exit",
+    )
+    return parser.parse_args(argv)
+
+
+def report_errors(errors):
+    for source_path, error in errors:
+        print(f"Error generating {source_path}: {error}", file=sys.stderr)
+    if errors:
+        print(f"{len(errors)} page(s) failed to generate", file=sys.stderr)
+
+
+def report_written(written, generated):
+    print(f"{written} of {generated} generated page(s) modified, {generated - written} unchanged")
+
+
+def generate(pages, args, cache):
+    # --async-io wins over --jobs, see their help
+    if args.async_io > 0:
+        return generate_pages_with_async_io(pages, args.basepath, args.async_io, cache=cache)
+    return generate_pages(pages, args.basepath, args.jobs, cache=cache)
+
+
+def staged_static_files(args):
+    # static files a later stage publishes, which the sync leaves alone
+    skip = set()
+    if args.images and pillow_available():
+        skip.update(find_images(dir_path_static))
+    if args.minify:
+        skip.update(find_stylesheets(dir_path_static))
+    return skip
+
+
+def use_image_attributes(attributes):
+    if set_image_attributes(attributes) and active_inline_memo() is not None:
+        # memoized inline html has the old img attributes in it
+        active_inline_memo().clear()
+
+
+def publish_images(args, names, previous=None):
+    print("Optimizing images...")
+    with stage("optimize_images"):
+        images = optimize_images(
+            dir_path_static,
+            dir_path_docs,
+            names,
+            previous,
+            widths=args.image_widths,
+            cache_dir=args.image_cache,
+            jobs=args.jobs,
+        )
+    use_image_attributes(image_attributes(images))
+    return images
+
+
+def publish_minified_css(args, names):
+    print("Minifying stylesheets...")
+    with stage("minify_static_css"):
+        minify_static_css(dir_path_static, dir_path_docs, names)
+
+
+def compress_docs(args):
+    print("Compressing pages and stylesheets...")
+    with stage("compress"):
+        compress_outputs(dir_path_docs, args.jobs, args.compress_min_bytes)
+
+
+def build_incremental(args, cache, previous=None, changed=None):
+    """
+    Build only what changed since the previous build.
+
+    previous is the manifest of that build, read from disk when not
+    given. changed, when known (as in --watch), is the set of paths that
+    changed since then, which spares re-hashing everything else.
+    """
+    basepath = args.basepath
+    if previous is None:
+        previous = load_manifest(manifest_path)
+
+    static_prefix = os.path.join(dir_path_static, "")
+    previous_static = previous.get("static") if previous else None
+    static_changed = previous is None or changed is None or any(path.startswith(static_prefix) for path in changed)
+    # a previous --fingerprint build published nothing under the plain names
+    was_fingerprinted = bool(previous_static) and any("output" in entry for entry in previous_static.values())
+    if args.fingerprint and static_changed:
+        print("Fingerprinting static files into docs directory...")
+        with stage("fingerprint_static"):
+            static_files = fingerprint_static(
+                dir_path_static,
+                dir_path_docs,
+                previous_static if previous_static is not None else load_asset_manifest(dir_path_docs),
+            )
+    elif not args.fingerprint and (static_changed or was_fingerprinted):
+        if was_fingerprinted:
+            remove_fingerprinted_outputs(dir_path_docs, previous_static)
+        print("Syncing static files to docs directory...")
+        with stage("copy_source_content_to_destination"):
+            static_files, _ = sync_source_content_to_destination(
+                dir_path_static,
+                dir_path_docs,
+                None if was_fingerprinted else previous_static,
+                checksum=args.static_checksum,
+                use_links=args.static_links,
+                skip=staged_static_files(args),
+            )
+    else:
+        static_files = previous_static
+    names = asset_names(static_files) if args.fingerprint else {}
+    set_asset_names(names)
+
+    previous_images = previous.get("images", {}) if previous else {}
+    if args.images and static_changed:
+        images = publish_images(args, names, previous_images)
+    elif args.images:
+        images = previous_images
+        use_image_attributes(image_attributes(images))
+    else:
+        remove_image_variants(dir_path_docs, previous_images)
+        images = {}
+        use_image_attributes({})
+    if args.minify and static_changed:
+        publish_minified_css(args, names)
+
+    if changed is not None and previous is not None and all(
+        path.startswith(static_prefix)
+        or (path in previous["pages"] or path in previous["templates"]) and os.path.exists(path)
+        for path in changed
+    ):
+        # only known files were edited, so the page list is still accurate
+        pages = [(source, entry["output"], entry["template"]) for source, entry in previous["pages"].items()]
+    else:
+        pages = find_content_pages(dir_path_content, dir_path_docs, template_path)
+    to_build, stale_outputs, manifest = plan_incremental_build(
+        pages, previous, basepath, changed, names, images, args.minify
+    )
+    manifest["static"] = static_files
+    remove_stale_outputs(stale_outputs, dir_path_docs)
+
+    print(f"Generating {len(to_build)} of {len(pages)} pages...")
+    errors, written = generate(to_build, args, cache)
+    report_written(len(written), len(to_build) - len(errors))
+    for source_path, _ in errors:
+        # forget failed pages so the next build retries them
+        del manifest["pages"][source_path]
+    with stage("dependency_graph"):
+        record_page_references(manifest, to_build, written)
+
+    manifest["compress"] = args.compress
+    if args.compress:
+        compress_docs(args)
+    elif previous is not None and previous.get("compress"):
+        # left in place they would go on being served with the old content
+        remove_sidecars(dir_path_docs)
+
+    save_manifest(manifest_path, manifest, previous)
+    return errors, manifest
+
+
+def what_rebuilds(paths, limit=20):
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        print("No dependency graph yet, run a build with --incremental first", file=sys.stderr)
+        return 1
+
+    graph = DependencyGraph(manifest, dir_path_static, dir_path_docs)
+    for path in paths:
+        kind, rebuilt, referencing = graph.affected_by(path)
+        if kind == "unknown":
+            print(f"{path}: not an input of the last build")
+            continue
+        print(f"{path} ({kind}): {len(rebuilt)} output(s) rebuilt")
+        for output in rebuilt[:limit]:
+            print(f"  {output}")
+        if len(rebuilt) > limit:
+            print(f"  ... and {len(rebuilt) - limit} more")
+        if referencing:
+            if len(rebuilt) > 1:
+                # a fingerprinted file is renamed, so the pages linking to it are among the rebuilt
+                print(f"  referenced by {len(referencing)} page(s), rebuilt to link to its new name:")
+            else:
+                print(f"  referenced by {len(referencing)} page(s), which are not rebuilt:")
+            for source_path in referencing[:limit]:
+                print(f"    {source_path}")
+            if len(referencing) > limit:
+                print(f"    ... and {len(referencing) - limit} more")
+    return 0
+
+
+def watch_site(args, cache):
+    errors, manifest = build_incremental(args, cache)
+    report_errors(errors)
+
+    # paths changed since the last rebuild that went through
+    unbuilt = set()
+
+    def rebuild(changed):
+        nonlocal manifest
+        changed = unbuilt | changed
+        start = time.perf_counter()
+        try:
+            errors, manifest = build_incremental(args, cache, manifest, changed)
+        except Exception as e:
+            # e.g. an editor's atomic save removing the template for a moment;
+            # the last manifest stays and the next change retries these paths
+            unbuilt.update(changed)
+            print(f"Rebuild failed: {type(e).__name__}: {e}", file=sys.stderr)
+            return
+        unbuilt.clear()
+        report_errors(errors)
+        if active_inline_memo() is not None:
+            active_inline_memo().report()
+        if active_minification() is not None:
+            active_minification().report()
+        print(f"Rebuilt after {len(changed)} change(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"Watching {dir_path_content}, {dir_path_static} and {template_path} (Ctrl+C to stop)...")
+    try:
+        watch(
+            [dir_path_content, dir_path_static, template_path],
+            rebuild,
+            interval=args.watch_interval,
+            debounce=args.watch_interval,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build(args, cache):
+    basepath = args.basepath
+
+    if args.incremental:
+        errors, _ = build_incremental(args, cache)
+        report_errors(errors)
+        return 1 if errors else 0
+
+    # read before docs/ is emptied: files whose size and mtime match keep their hash
+    previous_assets = load_asset_manifest(dir_path_docs) if args.fingerprint else None
     print("Deleting docs directory...")
-    delete_destination_contents(dir_path_docs)
+    with stage("delete_destination_contents"):
+        delete_destination_contents(dir_path_docs, args.copy_workers)
 
-    print("Copying static files to docs directory...")
-    copy_source_content_to_destination(dir_path_static, dir_path_docs)
+    names = {}
+    if args.fingerprint:
+        print("Fingerprinting static files into docs directory...")
+        with stage("fingerprint_static"):
+            names = asset_names(fingerprint_static(dir_path_static, dir_path_docs, previous_assets))
+        set_asset_names(names)
+    else:
+        print("Copying static files to docs directory...")
+        with stage("copy_source_content_to_destination"):
+            copy_source_content_to_destination(dir_path_static, dir_path_docs, args.copy_workers)
+    if args.images:
+        publish_images(args, names)
+    if args.minify:
+        publish_minified_css(args, names)
 
     print("Generating page...")
-    generate_page_recursively(
-        dir_path_content,
-        template_path,
-        dir_path_docs,
-        basepath
-    )
+    if args.jobs > 1 or args.async_io > 0:
+        pages = find_content_pages(dir_path_content, dir_path_docs, template_path)
+        errors, written = generate(pages, args, cache)
+        report_written(len(written), len(pages) - len(errors))
+        report_errors(errors)
+        status = 1 if errors else 0
+    else:
+        written = generate_page_recursively(
+            dir_path_content,
+            template_path,
+            dir_path_docs,
+            basepath,
+            cache,
+        )
+        report_written(written, written)
+        status = 0
+    if args.compress:
+        compress_docs(args)
+    return status
 
 
-if __name__ == '__main__':
-    main()
+def main(argv=None):
+    args = parse_args(argv)
+    if args.what_rebuilds:
+        return what_rebuilds(args.what_rebuilds)
 
+    cache = None
+    if args.render_cache:
+        cache = RenderCache(args.render_cache, args.render_cache_mb * 1024 * 1024)
+
+    memo = None
+    if args.inline_memo:
+        memo = enable_inline_memo(args.inline_memo * 1024 * 1024)
+
+    minification = enable_minification() if args.minify else None
+
+    if args.watch:
+        return watch_site(args, cache)
+
+    profiler = enable_profiling() if args.profile else None
+    status = build(args, cache)
+    if memo is not None:
+        memo.report()
+    if minification is not None:
+        minification.report()
+    if profiler is None:
+        return status
+
+    profiler.report(args.profile_top)
+    if args.profile_trace:
+        profiler.write_chrome_trace(args.profile_trace)
+        print(f"Chrome trace written to {args.profile_trace}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
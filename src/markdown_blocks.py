@@ -1,8 +1,15 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from htmlnode import HTMLNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode
 from inline_markdown import text_to_textnodes
+from inline_memo import active_inline_memo, enable_inline_memo
 from textnode import text_node_to_html_node, TextNode, TextType
 
+# bump whenever a parser change alters the html produced for the same markdown
+PARSER_VERSION = "1"
+
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
     HEADING = "heading"
@@ -11,48 +18,118 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
     UNORDERED_LIST = "unordered_list"
 
+_heading_prefixes = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+
+Block = namedtuple("Block", ["block_type", "lines", "start", "end"])
+Block.__doc__ = """A typed block: its lines and the 1-based line span it came from."""
+
+RenderResult = namedtuple("RenderResult", ["html", "error"])
+RenderResult.__doc__ = """One document of a batch: its html, or None and the error that stopped it."""
+
+def _strip_lines(lines):
+    # same result as "\n".join(lines).strip().split("\n"), without the copies
+    lo, hi = 0, len(lines)
+    while lo < hi and not lines[lo].strip():
+        lo += 1
+    while hi > lo and not lines[hi - 1].strip():
+        hi -= 1
+    if lo == hi:
+        return [""], 0
+    stripped = lines[lo:hi]
+    stripped[0] = stripped[0].lstrip()
+    stripped[-1] = stripped[-1].rstrip()
+    return stripped, lo
+
+def _chunk_to_blocks(chunk, start):
+    lines, offset = _strip_lines(chunk)
+    if lines == [""]:
+        return
+    start += offset
+    current = []
+    current_start = start
+    for index, line in enumerate(lines, start):
+        if line.startswith(_heading_prefixes):
+            # a heading line is always a block of its own
+            if current:
+                current_lines, current_offset = _strip_lines(current)
+                block_start = current_start + current_offset
+                yield Block(
+                    _lines_block_type(current_lines),
+                    current_lines,
+                    block_start,
+                    block_start + len(current_lines) - 1,
+                )
+                current = []
+            heading = [line.strip()]
+            yield Block(_lines_block_type(heading), heading, index, index)
+        else:
+            if not current:
+                current_start = index
+            current.append(line)
+    if current:
+        current_lines, current_offset = _strip_lines(current)
+        block_start = current_start + current_offset
+        yield Block(
+            _lines_block_type(current_lines),
+            current_lines,
+            block_start,
+            block_start + len(current_lines) - 1,
+        )
+
+def iter_blocks(lines):
+    """
+    Yield the Blocks of a markdown document one at a time.
+
+    Args:
+        lines: any iterable of lines, such as an open file; trailing
+            newlines are ignored
+
+    Only the lines of the block being built are held in memory. The
+    blocks are the same ones markdown_to_blocks returns.
+    """
+    chunk = []
+    chunk_start = 1
+    line_number = 0
+    for line_number, line in enumerate(lines, 1):
+        if line[-1:] == "\n":
+            line = line[:-1]
+        if line == "":
+            if len(chunk) == 1:
+                # most blocks are a single line, skip the general splitting
+                line = chunk[0].strip()
+                if line:
+                    yield Block(_lines_block_type((line,)), [line], chunk_start, chunk_start)
+                chunk = []
+            elif chunk:
+                yield from _chunk_to_blocks(chunk, chunk_start)
+                chunk = []
+            chunk_start = line_number + 1
+        else:
+            chunk.append(line)
+    if chunk:
+        yield from _chunk_to_blocks(chunk, chunk_start)
+
 def markdown_to_blocks(text):
-    raw_blocks = text.split("\n\n")
-    filtered_blocks = []
-    for block in raw_blocks:
-        block = block.strip()
-        if block == "":
-            continue
-        # NEW: if this block has multiple heading lines, split them
-        lines = block.split("\n")
-        current = []
-        for line in lines:
-            if line.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
-                # if we already collected some lines, flush them as a block
-                if current:
-                    filtered_blocks.append("\n".join(current).strip())
-                    current = []
-                # this heading line becomes its own block
-                filtered_blocks.append(line.strip())
-            else:
-                current.append(line)
-        if current:
-            filtered_blocks.append("\n".join(current).strip())
-    return filtered_blocks
+    return ["\n".join(block.lines) for block in iter_blocks(text.split("\n"))]
 
-def block_to_block_type(block):
-    lines = block.split("\n")
+def _lines_block_type(lines):
+    first = lines[0]
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+    if first.startswith(_heading_prefixes):
         return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and lines[-1].startswith("```"):
         return BlockType.CODE
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH
         return BlockType.QUOTE
-    if block.startswith("- "):
+    if first.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH
         return BlockType.UNORDERED_LIST
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -62,36 +139,116 @@ def block_to_block_type(block):
 
     return BlockType.PARAGRAPH
 
-def markdown_to_html_node(markdown):
-    children = []
-    splitted = markdown_to_blocks(markdown)
+def block_to_block_type(block):
+    return _lines_block_type(block.split("\n"))
 
-    for block in splitted:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
+def iter_block_html_nodes(lines):
+    """Yield the html node of each block of the document in lines as soon as it is parsed."""
+    for block in iter_blocks(lines):
+        yield block_lines_to_html_node(block.block_type, block.lines)
 
+def markdown_to_html_node(markdown):
+    children = list(iter_block_html_nodes(markdown.split("\n")))
     return ParentNode("div", children) 
 
+def _render_documents(documents):
+    results = []
+    for markdown in documents:
+        try:
+            results.append(RenderResult(markdown_to_html_node(markdown).to_html(), None))
+        except Exception as e:
+            results.append(RenderResult(None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _render_documents_in_worker(documents, inline_memo_bytes):
+    # each worker keeps its own memo across chunks and reports its counters
+    memo = enable_inline_memo(inline_memo_bytes) if inline_memo_bytes else None
+    hits, misses = (memo.hits, memo.misses) if memo else (0, 0)
+    results = _render_documents(documents)
+    return results, (memo.hits - hits, memo.misses - misses) if memo else (0, 0)
+
+def markdown_to_html_batch(documents, jobs=1, chunk_size=None, executor=None):
+    """
+    Render many markdown documents to html in one call.
+
+    Args:
+        documents: iterable of markdown strings
+        jobs: number of worker processes to start for this batch, 1
+            renders in this process
+        chunk_size: documents handed to a worker at once, defaults to a
+            few chunks per worker (per CPU with executor)
+        executor: a ProcessPoolExecutor to render on instead of starting
+            one, so a service can keep its workers warm between batches
+
+    Returns:
+        one RenderResult per document, in the order given. A document
+        that fails to parse gets its error message and does not stop the
+        others. The active inline memo, if any, is shared by every
+        document; each worker process keeps one of the same size.
+    """
+    documents = list(documents)
+    if executor is None and (jobs <= 1 or len(documents) <= 1):
+        return _render_documents(documents)
+
+    workers = jobs if executor is None else os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(documents) // (workers * 4)))
+    chunks = [documents[i:i + chunk_size] for i in range(0, len(documents), chunk_size)]
+
+    memo = active_inline_memo()
+    memo_bytes = memo.max_bytes if memo is not None else 0
+    pool = executor if executor is not None else ProcessPoolExecutor(max_workers=jobs)
+    results = []
+    try:
+        futures = [pool.submit(_render_documents_in_worker, chunk, memo_bytes) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_results, (hits, misses) = future.result()
+            except Exception as e:
+                # the worker itself died; every document it held fails
+                results.extend(RenderResult(None, f"{type(e).__name__}: {e}") for _ in chunk)
+                continue
+            results.extend(chunk_results)
+            if memo is not None:
+                memo.hits += hits
+                memo.misses += misses
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return results
+
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    lines = block.split("\n")
+    return block_lines_to_html_node(_lines_block_type(lines), lines)
+
+def block_lines_to_html_node(block_type, lines):
     if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
+        return _paragraph_lines_to_html_node(lines)
     if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
+        return heading_to_html_node("\n".join(lines))
     if block_type == BlockType.CODE:
-        return code_to_html_node(block)
+        return code_to_html_node("\n".join(lines))
     if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
+        return _quote_lines_to_html_node(lines)
     if block_type == BlockType.UNORDERED_LIST:
-        return unordered_list_to_html_node(block)
+        return _unordered_list_lines_to_html_node(lines)
     if block_type == BlockType.ORDERED_LIST:
-        return ordered_list_to_html_node(block)
+        return _ordered_list_lines_to_html_node(lines)
     raise ValueError("invalid block type")
 
 def text_to_children(text: str): 
-    nodes = text_to_textnodes(text)
-    html_nodes = [text_node_to_html_node(node) for node in nodes]
-    return html_nodes
+    memo = active_inline_memo()
+    if memo is None:
+        nodes = text_to_textnodes(text)
+        return [text_node_to_html_node(node) for node in nodes]
+
+    # with the memo on, the children collapse into one raw html leaf
+    html = memo.get(text)
+    if html is None:
+        nodes = text_to_textnodes(text)
+        html = "".join(text_node_to_html_node(node).to_html() for node in nodes)
+        memo.put(text, html)
+    return [LeafNode(None, html)]
 
 def heading_to_html_node(block): 
     level = len(block) - len(block.lstrip("#")) 
@@ -101,7 +258,9 @@ def heading_to_html_node(block):
     return ParentNode(f"h{level}", children_nodes)
 
 def paragraph_to_html_node(block): 
-    lines = block.split("\n")
+    return _paragraph_lines_to_html_node(block.split("\n"))
+
+def _paragraph_lines_to_html_node(lines):
     paragraph = " ".join(lines)
     children = text_to_children(paragraph)
     return ParentNode("p", children)
@@ -118,7 +277,9 @@ def code_to_html_node(block):
     return pre_node
 
 def quote_to_html_node(block): 
-    lines = block.split("\n")
+    return _quote_lines_to_html_node(block.split("\n"))
+
+def _quote_lines_to_html_node(lines):
     stripped_lines = []
     
     for line in lines:
@@ -138,8 +299,10 @@ def quote_to_html_node(block):
     return quote_node
 
 def unordered_list_to_html_node(block): 
+    return _unordered_list_lines_to_html_node(block.split("\n"))
+
+def _unordered_list_lines_to_html_node(lines):
     li_nodes = []
-    lines = block.split("\n")
 
     for line in lines:
         line = line.strip()
@@ -160,8 +323,10 @@ def unordered_list_to_html_node(block):
     return ul_node
 
 def ordered_list_to_html_node(block): 
+    return _ordered_list_lines_to_html_node(block.split("\n"))
+
+def _ordered_list_lines_to_html_node(lines):
     ol_nodes = []
-    lines = block.split("\n")
 
     for line in lines:
         line = line.strip()
@@ -0,0 +1,324 @@
+import os
+import re
+import threading
+import weakref
+
+from profiling import stage
+
+# elements whose whitespace is part of their content
+_preserved_re = re.compile(r"<(pre|code|textarea|script|style)\b.*?</\1\s*>", re.S | re.I)
+_preserved_open_re = re.compile(r"<(?:pre|code|textarea|script|style)\b", re.I)
+# html's whitespace; \s would also take in non-breaking and other unicode spaces
+_space = "[ \t\n\r\f]"
+_whitespace_re = re.compile(f"{_space}+")
+# whitespace next to these tags never shows, so it is dropped rather than kept as one space
+_block_tags = frozenset(
+    "!doctype html head body title meta link base div p ul ol li dl dt dd h1 h2 h3 h4 h5 h6 blockquote "
+    "pre hr br main nav header footer section article aside figure figcaption table thead tbody tfoot tr td th".split()
+)
+
+
+def _alternation(names):
+    # names grouped by their first letter, which the regex engine rejects in one step
+    groups = {}
+    for name in names:
+        groups.setdefault(name[0], []).append(re.escape(name[1:]))
+    branches = []
+    for first, rests in sorted(groups.items()):
+        rests.sort(key=len, reverse=True)
+        branches.append(re.escape(first) + (f"(?:{'|'.join(rests)})" if rests != [""] else ""))
+    return f"(?:{'|'.join(branches)})"
+
+
+# lower and upper case only: re.I makes the search several times slower, and a
+# space kept next to a <Div> costs a byte, not correctness
+_block_tag_open = "</?{}(?![a-zA-Z0-9])".format(_alternation(_block_tags | {name.upper() for name in _block_tags}))
+# the rest of a tag, whose quoted attribute values may hold > or whitespace
+_tag_rest = """(?:[^>"'\0]|"[^"]*"|'[^']*')*>"""
+_tag_re = re.compile(f"<[a-zA-Z!/?]{_tag_rest}")
+# _collapse runs these one after the other; the last two start with a literal,
+# which the regex engine finds far faster than a character class, and the
+# first only runs when a str search finds something for it
+_run_re = re.compile(f"{_space}{{2,}}|[\t\n\r\f]")
+_space_after_block_re = re.compile(f"({_block_tag_open}{_tag_rest}) ")
+_space_before_block_re = re.compile(f" (?={_block_tag_open})")
+_css_token_re = re.compile(r"""(/\*.*?\*/)|("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')""", re.S)
+_css_punctuation_re = re.compile(r" ?([{};,]) ?")
+
+_stats = None
+# CompiledTemplate -> (its copy with minified literals or None, characters that saved)
+_minified_templates = weakref.WeakKeyDictionary()
+
+
+class MinifyStats:
+    def __init__(self):
+        """Pages minified and their size before and after, safe to share between threads."""
+        self.pages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def add(self, pages, bytes_in, bytes_out):
+        with self._lock:
+            self.pages += pages
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def report(self):
+        saved = self.bytes_in - self.bytes_out
+        share = 100 * saved / self.bytes_in if self.bytes_in else 0.0
+        print(f"Minified {self.pages} pages: {saved} bytes saved ({share:.1f}% of {self.bytes_in})")
+
+
+def enable_minification():
+    global _stats
+    # a forked worker starts with counters of its own
+    if _stats is None or _stats.pid != os.getpid():
+        _stats = MinifyStats()
+    return _stats
+
+
+def disable_minification():
+    global _stats
+    _stats = None
+
+
+def active_minification():
+    return _stats
+
+
+def _inside_tag(html, position):
+    tag_start = html.rfind("<", 0, position)
+    if tag_start < 0:
+        return False
+    tag = _tag_re.match(html, tag_start)
+    return tag is not None and tag.end() > position
+
+
+def _collapsed_run(match):
+    # whitespace inside a tag is part of an attribute value, which is left exactly as written
+    return match.group(0) if _inside_tag(match.string, match.start()) else " "
+
+
+def _dropped_space(match):
+    return match.group(0) if _inside_tag(match.string, match.start()) else ""
+
+
+def _collapse(html):
+    # runs of whitespace and any but a space become one space, and the
+    # spaces left next to a block tag are then dropped
+    if "\t" in html or "\n" in html or "\r" in html or "\f" in html or "  " in html:
+        html = _run_re.sub(_collapsed_run, html)
+    html = _space_after_block_re.sub(r"\1", html)
+    return _space_before_block_re.sub(_dropped_space, html)
+
+
+def _minify_html(html, after_block=False):
+    # after_block: html follows a pre element, so leading whitespace is dropped;
+    # returns the minified html and whether it too ends on one
+    texts = []
+    elements = []
+    position = 0
+    for match in _preserved_re.finditer(html):
+        texts.append(html[position:match.start()])
+        elements.append(match)
+        position = match.end()
+    texts.append(html[position:])
+    if len(texts) > 1 and "\0" not in html:
+        # collapsed in one go, the NULs keeping the texts apart
+        texts = _collapse("\0".join(texts)).split("\0")
+    else:
+        texts = [_collapse(text) for text in texts]
+
+    parts = []
+    for text, match in zip(texts, elements):
+        block = match.group(1).lower() != "code"
+        if after_block:
+            text = text.lstrip(" ")
+        parts.append(text.rstrip(" ") if block else text)
+        parts.append(match.group(0))
+        after_block = block
+    text = texts[-1]
+    if after_block:
+        text = text.lstrip(" ")
+    parts.append(text)
+    return "".join(parts), after_block and not text
+
+
+def minify_html(html):
+    """
+    Collapse the whitespace of an html document.
+
+    Runs of whitespace become one space, and none at all next to block
+    level tags. pre, code, textarea, script and style elements are left
+    exactly as they are. Only ASCII whitespace is removed, so the
+    characters saved are also the bytes saved.
+    """
+    return _minify_html(html)[0]
+
+
+class HtmlMinifier:
+    def __init__(self):
+        """
+        minify_html for a document written in pieces, as stream_page does.
+
+        feed returns the minified text that is certain not to change, and
+        holds back the rest: the last tag and the whitespace before it,
+        which depend on what follows, and any pre or code element that is
+        not closed yet.
+        """
+        self._pending = ""
+        self._after_block = False
+
+    def feed(self, html):
+        html = self._pending + html
+        cut = len(html)
+        position = 0
+        for match in _preserved_re.finditer(html):
+            position = match.end()
+        unclosed = _preserved_open_re.search(html, position)
+        if unclosed is not None:
+            cut = unclosed.start()
+        last_tag = html.rfind("<", position, cut)
+        if last_tag >= 0:
+            cut = last_tag
+        cut = len(html[:cut].rstrip(" \t\n\r\f"))
+        self._pending = html[cut:]
+        minified, self._after_block = _minify_html(html[:cut], self._after_block)
+        return minified
+
+    def finish(self):
+        html, self._pending = self._pending, ""
+        minified, self._after_block = _minify_html(html, self._after_block)
+        return minified
+
+
+def minify_page(html):
+    """Minify a generated page while minification is enabled, counting what it saved; else return html."""
+    if _stats is None:
+        return html
+    with stage("minify"):
+        minified = minify_html(html)
+    _stats.add(1, len(html), len(minified))
+    return minified
+
+
+def _leaves_element_open(html):
+    position = 0
+    for match in _preserved_re.finditer(html):
+        position = match.end()
+    return _preserved_open_re.search(html, position) is not None
+
+
+def _minified_template(template):
+    cached = _minified_templates.get(template)
+    if cached is None:
+        slot_indexes = {index for index, _, _ in template.slots}
+        literals = [part for index, part in enumerate(template.parts) if index not in slot_indexes]
+        if any(_leaves_element_open(part) for part in literals):
+            # a slot inside a pre element: only the whole page can be minified
+            cached = (None, 0)
+        else:
+            minified = template.with_literals(minify_html)
+            cached = (minified, sum(map(len, template.parts)) - sum(map(len, minified.parts)))
+        _minified_templates[template] = cached
+    return cached
+
+
+def render_minified_page(template, values):
+    """
+    template.render(values), minified when minification is enabled.
+
+    The template's own text is the same on every page, so it is minified
+    once and kept; only the values are minified for each page.
+    """
+    if _stats is None:
+        return template.render(values)
+    minified_template, saved = _minified_template(template)
+    if minified_template is None:
+        return minify_page(template.render(values))
+    with stage("minify"):
+        minified_values = {name: minify_html(value) for name, value in values.items()}
+        html = minified_template.render(minified_values)
+    for _, name, _ in template.slots:
+        if name in values:
+            saved += len(values[name]) - len(minified_values[name])
+    _stats.add(1, len(html) + saved, len(html))
+    return html
+
+
+def _minify_css_code(css):
+    css = _whitespace_re.sub(" ", css)
+    return _css_punctuation_re.sub(r"\1", css).replace(": ", ":").replace(";}", "}")
+
+
+def minify_css(css):
+    """
+    Strip the comments and the whitespace that carries no meaning from a stylesheet.
+
+    Quoted strings and /*! license comments */ are kept as they are.
+    Spaces before a colon are kept, as in "a :hover", and so are the
+    ones around + and -, which calc() needs.
+    """
+    parts = []
+    code = []
+    position = 0
+    for match in _css_token_re.finditer(css):
+        code.append(css[position:match.start()])
+        position = match.end()
+        token = match.group(2) or match.group(1)
+        if match.group(2) is not None or token.startswith("/*!"):
+            parts.append(_minify_css_code("".join(code)))
+            parts.append(token)
+            code = []
+        else:
+            # a comment separates tokens as a space does: 1px/**/2px is 1px 2px
+            code.append(" ")
+    code.append(css[position:])
+    parts.append(_minify_css_code("".join(code)))
+    return "".join(parts).strip()
+
+
+def find_stylesheets(static_dir):
+    """Paths relative to static_dir of the stylesheets minify_static_css publishes."""
+    found = []
+    for dir_path, _, file_names in os.walk(static_dir):
+        for file_name in file_names:
+            if file_name.lower().endswith(".css"):
+                found.append(os.path.relpath(os.path.join(dir_path, file_name), static_dir))
+    return sorted(found)
+
+
+def minify_static_css(static_dir, docs_dir, published=None):
+    """
+    Publish the stylesheets of static_dir minified.
+
+    Args:
+        static_dir: source directory, e.g. static/
+        docs_dir: directory the stylesheets are published into
+        published: maps the url path of a static file to the one it is
+            published under, see fingerprint.asset_names
+
+    Returns:
+        (files, bytes_in, bytes_out) for the stylesheets minified. A
+        published stylesheet that is already up to date is not rewritten.
+    """
+    # imported here: content_generation minifies pages with this module
+    from content_generation import write_if_changed
+
+    published = published or {}
+    files = bytes_in = bytes_out = 0
+    for rel_path in find_stylesheets(static_dir):
+        with open(os.path.join(static_dir, rel_path), "r", encoding="utf-8") as f:
+            css = f.read()
+        minified = minify_css(css)
+        url_path = rel_path.replace(os.sep, "/")
+        write_if_changed(os.path.join(docs_dir, published.get(url_path, url_path)), minified)
+        files += 1
+        bytes_in += len(css.encode("utf-8"))
+        bytes_out += len(minified.encode("utf-8"))
+    saved = bytes_in - bytes_out
+    share = 100 * saved / bytes_in if bytes_in else 0.0
+    print(f"Minified {files} stylesheets: {saved} bytes saved ({share:.1f}% of {bytes_in})")
+    return files, bytes_in, bytes_out
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+_profiler = None
+
+
+class BuildProfiler:
+    def __init__(self):
+        """
+        Collects (name, page, start_ns, duration_ns, pid) events for each timed stage.
+
+        Timestamps come from perf_counter_ns, which is CLOCK_MONOTONIC on
+        Linux, so events recorded in worker processes line up with ours.
+        """
+        self.events = []
+        self.started_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def report(self, top_n=10):
+        wall_ns = time.perf_counter_ns() - self.started_ns
+        totals = {}
+        for name, _, _, duration_ns, _ in self.events:
+            count, total = totals.get(name, (0, 0))
+            totals[name] = (count + 1, total + duration_ns)
+
+        print(f"Build profile ({wall_ns / 1e9:.3f}s wall):")
+        print(f"  {'stage':36s} {'calls':>8s} {'total':>10s} {'mean':>10s} {'share':>7s}")
+        for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(
+                f"  {name:36s} {count:8d} {total / 1e9:9.3f}s {total / count / 1e6:8.3f}ms"
+                f" {100 * total / wall_ns:6.1f}%"
+            )
+
+        pages = [event for event in self.events if event[0] == "generate_page"]
+        if pages:
+            print(f"  {len(pages)} pages, {len(pages) / (wall_ns / 1e9):.1f} pages/s")
+            print(f"Slowest {min(top_n, len(pages))} pages:")
+            for _, page, _, duration_ns, _ in sorted(pages, key=lambda event: -event[3])[:top_n]:
+                print(f"  {duration_ns / 1e6:9.3f}ms  {page}")
+
+    def write_chrome_trace(self, path):
+        """Write the events in the Chrome trace format, for chrome://tracing or Perfetto."""
+        trace_events = []
+        for name, page, start_ns, duration_ns, pid in self.events:
+            event = {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": (start_ns - self.started_ns) / 1000,
+                "dur": duration_ns / 1000,
+                "pid": pid,
+                "tid": pid,
+            }
+            if page is not None:
+                event["args"] = {"page": str(page)}
+            trace_events.append(event)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "page", "start_ns")
+
+    def __init__(self, profiler, name, page):
+        self.profiler = profiler
+        self.name = name
+        self.page = page
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end_ns = time.perf_counter_ns()
+        self.profiler.events.append(
+            (self.name, self.page, self.start_ns, end_ns - self.start_ns, os.getpid())
+        )
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+def enable_profiling():
+    global _profiler
+    # a forked worker starts with its own profiler, not a copy of the parent's events
+    if _profiler is None or _profiler.pid != os.getpid():
+        _profiler = BuildProfiler()
+    return _profiler
+
+
+def active_profiler():
+    return _profiler
+
+
+def stage(name, page=None):
+    """Time the enclosed block as stage name; costs one None check when profiling is off."""
+    if _profiler is None:
+        return _null_stage
+    return _Stage(_profiler, name, page)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from markdown_blocks import PARSER_VERSION, markdown_to_html_node
+from profiling import stage
+from textnode import image_attributes_digest
+
+DEFAULT_CACHE_DIR = "./.cache/render"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(markdown):
+    h = hashlib.sha256(PARSER_VERSION.encode("utf-8"))
+    h.update(b"\0")
+    if image_attributes_digest():
+        # images render differently once they have sizes and variants
+        h.update(image_attributes_digest().encode("utf-8"))
+        h.update(b"\0")
+    h.update(markdown.encode("utf-8"))
+    return h.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        On-disk cache of rendered markdown, evicted least recently used first.
+
+        Args:
+            directory: where the cached fragments are stored
+            max_bytes: total size the cache is trimmed back to after each store
+
+        Entries are keyed by cache_key, so a parser change (PARSER_VERSION)
+        never serves stale html. Several processes may share a directory;
+        an entry evicted by one of them simply becomes a miss for the others.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._total_bytes = 0
+
+    def __getstate__(self):
+        # worker processes rebuild the index themselves instead of receiving a copy
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_bytes"])
+
+    def _load_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".html"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, entry.name[:-5], stat.st_size))
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._total_bytes = sum(self._entries.values())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def get(self, key):
+        if self._entries is None:
+            self._load_index()
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+        if key not in self._entries:
+            self._entries[key] = len(html.encode("utf-8"))
+            self._total_bytes += self._entries[key]
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key, html):
+        if self._entries is None:
+            self._load_index()
+        data = html.encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._total_bytes -= self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self._total_bytes += len(data)
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+def _render(markdown):
+    with stage("markdown_to_html_node"):
+        node = markdown_to_html_node(markdown)
+    with stage("to_html"):
+        return node.to_html()
+
+
+def render_markdown(markdown, cache=None):
+    """Render markdown to an html string, reusing cached output for sources seen before."""
+    if cache is None:
+        return _render(markdown)
+    key = cache_key(markdown)
+    html = cache.get(key)
+    if html is None:
+        html = _render(markdown)
+        cache.put(key, html)
+    return html
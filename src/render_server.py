@@ -0,0 +1,205 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from content_generation import render_page
+from fingerprint import asset_names, load_asset_manifest
+from inline_memo import DEFAULT_MAX_BYTES as DEFAULT_INLINE_MEMO_BYTES, active_inline_memo, enable_inline_memo
+from markdown_blocks import markdown_to_html_node
+from templates import set_asset_names
+
+DEFAULT_PORT = 8888
+DEFAULT_MAX_PENDING = 64
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# latencies kept for the percentiles, the most recent ones win
+LATENCY_WINDOW = 10_000
+
+
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        """Request counters and a rolling window of render latencies, safe to share between threads."""
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.in_flight -= 1
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def percentile(self, fraction):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+        }
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # connections waiting to be accepted; backpressure comes from max_pending
+    request_queue_size = 128
+
+    def __init__(self, address, template_path, basepath="/", docs_dir="./docs", max_pending=DEFAULT_MAX_PENDING):
+        """
+        Preview server that renders markdown with a warm parser.
+
+        Args:
+            address: (host, port) to listen on, port 0 picks a free one
+            template_path: template wrapped around rendered pages
+            basepath: basepath links are rewritten to
+            docs_dir: built site served for every other GET
+            max_pending: renders allowed in flight at once; requests past
+                that get 503 straight away instead of queueing without end
+        """
+        self.template_path = template_path
+        self.basepath = basepath
+        self.stats = LatencyStats()
+        self.slots = threading.BoundedSemaphore(max_pending)
+        super().__init__(address, partial(RenderRequestHandler, directory=docs_dir))
+
+
+class RenderRequestHandler(SimpleHTTPRequestHandler):
+    def log_request(self, code="-", size="-"):
+        # one line per preview keystroke is noise; errors are still logged
+        pass
+
+    def send_body(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/metrics":
+            metrics = self.server.stats.snapshot()
+            memo = active_inline_memo()
+            if memo is not None:
+                metrics["inline_memo"] = {"hits": memo.hits, "misses": memo.misses, "entries": len(memo)}
+            self.send_body(200, "application/json", json.dumps(metrics))
+            return
+        super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self.send_body(404, "text/plain; charset=utf-8", "POST markdown to /render\n")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_body(400, "text/plain; charset=utf-8", "Content-Length must be a byte count\n")
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_body(413, "text/plain; charset=utf-8", f"body over {MAX_BODY_BYTES} bytes\n")
+            return
+
+        # claim a slot before reading the body, so a rejected request costs next to nothing
+        if not self.server.slots.acquire(blocking=False):
+            self.server.stats.reject()
+            # the body is left unread, so the connection cannot carry another request
+            self.close_connection = True
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        try:
+            body = self.rfile.read(length)
+            self.server.stats.begin()
+            start = time.perf_counter()
+            try:
+                markdown = body.decode("utf-8")
+                if parse_qs(url.query).get("fragment") == ["1"]:
+                    html = markdown_to_html_node(markdown).to_html()
+                else:
+                    html = render_page(markdown, self.server.template_path, self.server.basepath)
+            except Exception as e:
+                self.server.stats.record(time.perf_counter() - start, ok=False)
+                self.send_body(400, "text/plain; charset=utf-8", f"{type(e).__name__}: {e}\n")
+                return
+        finally:
+            self.server.slots.release()
+        self.server.stats.record(time.perf_counter() - start, ok=True)
+        self.send_body(200, "text/html; charset=utf-8", html)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve docs/ and render markdown previews on POST /render")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--template", default="./template.html", help="template wrapped around previews")
+    parser.add_argument("--basepath", default="/")
+    parser.add_argument("--docs", default="./docs", help="directory served for GET requests")
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=DEFAULT_MAX_PENDING,
+        metavar="N",
+        help="renders in flight before further requests get 503",
+    )
+    parser.add_argument(
+        "--inline-memo-mb",
+        type=int,
+        default=DEFAULT_INLINE_MEMO_BYTES // (1024 * 1024),
+        metavar="MB",
+        help="size of the inline memo kept warm between previews, 0 to turn it off",
+    )
+    args = parser.parse_args(argv)
+
+    if args.inline_memo_mb:
+        enable_inline_memo(args.inline_memo_mb * 1024 * 1024)
+    # previews link to the fingerprinted names of the site being served, if it has any
+    set_asset_names(asset_names(load_asset_manifest(args.docs)))
+    server = RenderServer((args.host, args.port), args.template, args.basepath, args.docs, args.max_pending)
+    host, port = server.server_address[:2]
+    print(f"Serving {args.docs} on http://{host}:{port}/, POST markdown to /render, stats at /metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import re
+
+TEMPLATE_OVERRIDE_NAME = "template.html"
+
+_placeholder_re = re.compile(r"\{\{ (\w+) \}\}")
+_url_attributes = ('href="', 'src="')
+_asset_reference_re = re.compile(r'((?:href|src)="/)([^"#?]*)')
+_srcset_re = re.compile(r'srcset="([^"]*)"')
+_template_cache = {}
+_asset_names = {}
+# bumped by set_asset_names so templates compiled against other names are not reused
+_asset_names_version = 0
+
+
+def set_asset_names(names):
+    """
+    Rewrite links to static files to their published names from now on.
+
+    Args:
+        names: maps paths relative to the site root, such as index.css,
+            to the name each is published under, such as index.3fa2c1d0.css
+    """
+    global _asset_names, _asset_names_version
+    if names != _asset_names:
+        _asset_names = dict(names)
+        _asset_names_version += 1
+
+
+def active_asset_names():
+    return _asset_names
+
+
+def _rename_asset(match):
+    path = match.group(2)
+    return match.group(1) + _asset_names.get(path, path)
+
+
+def _rewrite_srcset(match, basepath):
+    # every candidate url of the list, not just the first
+    candidates = []
+    for candidate in match.group(1).split(", "):
+        if candidate.startswith("/"):
+            candidate = basepath + candidate[1:]
+        candidates.append(candidate)
+    return 'srcset="' + ", ".join(candidates) + '"'
+
+
+def rewrite_links(text, basepath):
+    """Point root-relative href/src attributes at basepath and at the published asset names."""
+    if _asset_names and "/" in text:
+        text = _asset_reference_re.sub(_rename_asset, text)
+    if basepath == "/":
+        return text
+    if 'srcset="' in text:
+        text = _srcset_re.sub(lambda match: _rewrite_srcset(match, basepath), text)
+    text = text.replace('href="/', 'href="' + basepath)
+    return text.replace('src="/', 'src="' + basepath)
+
+
+class CompiledTemplate:
+    def __init__(self, source: str, basepath: str):
+        """
+        Compile a template into literal segments and named slots.
+
+        Args:
+            source: template text with {{ Name }} placeholders
+            basepath: basepath the literal href/src attributes are rewritten to
+
+        The literals are stored with the basepath rewrite already applied,
+        so rendering only has to rewrite the slot values.
+        """
+        self.basepath = basepath
+        self.parts = []
+        self.slots = []
+        self.url_slots = set()
+
+        position = 0
+        for match in _placeholder_re.finditer(source):
+            literal = source[position:match.start()]
+            self.parts.append(rewrite_links(literal, basepath))
+            if literal.endswith(_url_attributes):
+                # e.g. href="{{ Url }}" picks up the basepath when Url is root-relative
+                self.url_slots.add(len(self.parts))
+            self.slots.append((len(self.parts), match.group(1), match.group(0)))
+            self.parts.append(match.group(0))
+            position = match.end()
+        self.parts.append(rewrite_links(source[position:], basepath))
+
+    def _filled_parts(self, values):
+        parts = self.parts.copy()
+        for index, name, placeholder in self.slots:
+            value = values.get(name)
+            if value is None:
+                continue
+            value = rewrite_links(value, self.basepath)
+            if index in self.url_slots and value.startswith("/"):
+                value = self.basepath + value[1:]
+            parts[index] = value
+        return parts
+
+    def with_literals(self, transform):
+        """A copy of the template with transform applied to each of its literal segments, slots untouched."""
+        copy = object.__new__(CompiledTemplate)
+        copy.__dict__.update(self.__dict__)
+        slot_indexes = {index for index, _, _ in self.slots}
+        copy.parts = [part if index in slot_indexes else transform(part) for index, part in enumerate(self.parts)]
+        return copy
+
+    def render(self, values: dict) -> str:
+        """Fill the slots from values; unknown placeholders are left as they are."""
+        return "".join(self._filled_parts(values))
+
+    def render_around(self, values: dict, name: str):
+        """
+        Render everything but the name slot, for a caller that writes that value itself.
+
+        Returns:
+            (before, after) text on either side of the slot, or None when
+            name does not appear exactly once outside an attribute. The
+            streamed value still needs rewrite_links applied to it.
+        """
+        indexes = [index for index, slot_name, _ in self.slots if slot_name == name]
+        if len(indexes) != 1 or indexes[0] in self.url_slots:
+            return None
+        parts = self._filled_parts(values)
+        return "".join(parts[:indexes[0]]), "".join(parts[indexes[0] + 1:])
+
+
+def load_template(template_path, basepath):
+    """
+    Return the compiled template at template_path.
+
+    Templates are read and compiled once per basepath and reused until
+    the file on disk changes.
+    """
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), basepath, _asset_names_version)
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = CompiledTemplate(f.read(), basepath)
+    _template_cache[key] = ((stat.st_mtime_ns, stat.st_size), template)
+    return template
+
+
+def directory_template(dir_path, template_path):
+    """Template for the pages in dir_path: its own override, if any, or template_path."""
+    override_path = os.path.join(dir_path, TEMPLATE_OVERRIDE_NAME)
+    if os.path.isfile(override_path):
+        return override_path
+    return template_path
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from async_build import generate_pages_with_async_io
+from content_generation import find_content_pages, generate_pages
+
+
+class TestAsyncBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write('<title>{{ Title }}</title><img src="/a.png">{{ Content }}')
+        for number in range(30):
+            path = os.path.join(self.root, "content", f"page-{number}", "index.md")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"# Page {number}\n\nText with **bold** and a [link](/blog)." if number != 7 else "no title")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, dest_name, generate):
+        pages = find_content_pages(
+            os.path.join(self.root, "content"), os.path.join(self.root, dest_name), self.template
+        )
+        errors, _ = generate(pages)
+        outputs = {}
+        for _, dest_path, _ in pages:
+            if os.path.exists(dest_path):
+                with open(dest_path, "rb") as f:
+                    outputs[os.path.relpath(dest_path, os.path.join(self.root, dest_name))] = f.read()
+        return errors, outputs
+
+    def test_matches_serial_build(self):
+        serial_errors, serial = self.build("serial", lambda pages: generate_pages(pages, "/site/"))
+        async_errors, overlapped = self.build(
+            "async", lambda pages: generate_pages_with_async_io(pages, "/site/", io_workers=4, queue_size=2)
+        )
+        self.assertEqual(serial, overlapped)
+        self.assertEqual(len(serial), 29)
+        self.assertEqual([os.path.basename(os.path.dirname(p)) for p, _ in async_errors], ["page-7"])
+        self.assertEqual(len(serial_errors), len(async_errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from build_manifest import (
+    load_manifest,
+    plan_incremental_build,
+    references_path,
+    remove_stale_outputs,
+    save_manifest,
+)
+
+
+class TestPlanIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template = self.write("template.html", "<html>{{ Content }}</html>")
+        self.page_a = self.write("content/a.md", "# A")
+        self.page_b = self.write("content/b.md", "# B")
+        self.pages = [
+            (self.page_a, os.path.join(self.root, "docs/a.html"), self.template),
+            (self.page_b, os.path.join(self.root, "docs/b.html"), self.template),
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def build_all(self, pages, previous, basepath="/"):
+        to_build, stale, manifest = plan_incremental_build(pages, previous, basepath)
+        for _, dest_path, _ in to_build:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, "w") as f:
+                f.write("built")
+        return to_build, stale, manifest
+
+    def test_first_build_builds_everything(self):
+        to_build, stale, _ = self.build_all(self.pages, None)
+        self.assertEqual(to_build, self.pages)
+        self.assertEqual(stale, [])
+
+    def test_unchanged_build_is_empty(self):
+        _, _, manifest = self.build_all(self.pages, None)
+        to_build, stale, _ = self.build_all(self.pages, manifest)
+        self.assertEqual(to_build, [])
+        self.assertEqual(stale, [])
+
+    def test_only_changed_source_is_rebuilt(self):
+        _, _, manifest = self.build_all(self.pages, None)
+        self.write("content/b.md", "# B changed")
+        to_build, _, _ = self.build_all(self.pages, manifest)
+        self.assertEqual(to_build, [self.pages[1]])
+
+    def test_template_or_basepath_change_rebuilds_everything(self):
+        _, _, manifest = self.build_all(self.pages, None)
+        to_build, _, _ = self.build_all(self.pages, manifest, basepath="/site/")
+        self.assertEqual(to_build, self.pages)
+
+        _, _, manifest = self.build_all(self.pages, None)
+        self.write("template.html", "<html><body>{{ Content }}</body></html>")
+        to_build, _, _ = self.build_all(self.pages, manifest)
+        self.assertEqual(to_build, self.pages)
+
+    def test_switching_minification_rebuilds_everything(self):
+        _, _, manifest = self.build_all(self.pages, None)
+        to_build, _, manifest = plan_incremental_build(self.pages, manifest, "/", minify=True)
+        self.assertEqual(to_build, self.pages)
+        to_build, _, _ = plan_incremental_build(self.pages, manifest, "/", minify=True)
+        self.assertEqual(to_build, [])
+
+    def test_override_template_change_rebuilds_only_its_pages(self):
+        override = self.write("content/template.html", "<main>{{ Content }}</main>")
+        pages = [self.pages[0], (self.page_b, self.pages[1][1], override)]
+        _, _, manifest = self.build_all(pages, None)
+        self.write("content/template.html", "<article>{{ Content }}</article>")
+        to_build, _, _ = self.build_all(pages, manifest)
+        self.assertEqual(to_build, [pages[1]])
+
+    def test_image_attribute_change_rebuilds_pages_showing_it(self):
+        png = os.path.join("images", "a.png")
+        images = {png: {"attributes": {"width": "640", "height": "480"}}}
+        _, _, manifest = plan_incremental_build(self.pages, None, "/", images=images)
+        manifest["pages"][self.page_a]["references"] = [png]
+        manifest["pages"][self.page_b]["references"] = []
+        for _, dest_path, _ in self.pages:
+            self.write(dest_path, "built")
+
+        to_build, _, _ = plan_incremental_build(self.pages, manifest, "/", images=images)
+        self.assertEqual(to_build, [])
+        images = {png: {"attributes": {"width": "640", "height": "480", "srcset": "/images/a-480w.png 480w"}}}
+        to_build, _, _ = plan_incremental_build(self.pages, manifest, "/", images=images)
+        self.assertEqual(to_build, [self.pages[0]])
+
+    def test_removed_source_output_is_stale(self):
+        _, _, manifest = self.build_all(self.pages, None)
+        to_build, stale, _ = self.build_all(self.pages[:1], manifest)
+        self.assertEqual(to_build, [])
+        self.assertEqual(stale, [self.pages[1][1]])
+
+        remove_stale_outputs(stale, os.path.join(self.root, "docs"))
+        self.assertFalse(os.path.exists(self.pages[1][1]))
+        self.assertTrue(os.path.exists(self.pages[0][1]))
+
+
+class TestSaveManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, ".build_manifest.json")
+        pages = [(f"content/{name}.md", f"docs/{name}.html", "template.html") for name in ("a", "b")]
+        with unittest.mock.patch("build_manifest.hash_file", return_value="0" * 64):
+            _, _, self.manifest = plan_incremental_build(pages, None, "/")
+        self.manifest["pages"]["content/a.md"]["references"] = ["index.css"]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_references_round_trip_through_their_own_file(self):
+        save_manifest(self.path, self.manifest)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("index.css", f.read())
+        self.assertEqual(load_manifest(self.path), self.manifest)
+
+    def test_references_file_is_only_rewritten_when_they_change(self):
+        save_manifest(self.path, self.manifest)
+        previous = load_manifest(self.path)
+        with unittest.mock.patch("build_manifest.os.replace", wraps=os.replace) as replace:
+            self.manifest["pages"]["content/b.md"]["hash"] = "1" * 64
+            save_manifest(self.path, self.manifest, previous)
+            self.assertEqual([call.args[1] for call in replace.call_args_list], [self.path])
+
+            self.manifest["pages"]["content/b.md"]["references"] = []
+            save_manifest(self.path, self.manifest, previous)
+            self.assertEqual(replace.call_args_list[-2].args[1], references_path(self.path))
+        self.assertEqual(load_manifest(self.path), self.manifest)
+
+    def test_deleted_references_file_is_written_again(self):
+        save_manifest(self.path, self.manifest)
+        previous = load_manifest(self.path)
+        os.remove(references_path(self.path))
+        save_manifest(self.path, self.manifest, previous)
+        self.assertEqual(load_manifest(self.path), self.manifest)
+
+    def test_references_of_another_save_are_dropped(self):
+        save_manifest(self.path, self.manifest)
+        # a crash after the references of the next save were written, before its manifest
+        other = os.path.join(self.tmp.name, "other.json")
+        self.manifest["pages"]["content/a.md"]["references"] = ["other.css"]
+        save_manifest(other, self.manifest)
+        os.replace(references_path(other), references_path(self.path))
+
+        loaded = load_manifest(self.path)
+        self.assertNotIn("references", loaded["pages"]["content/a.md"])
+        self.assertNotIn("references_digest", loaded)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import compress
+from compress import compress_outputs, remove_sidecars, sidecar_suffixes
+
+PAGE = "<p>" + "Some text that repeats. " * 100 + "</p>"
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestCompressOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = self.tmp.name
+        self.page = os.path.join(self.docs, "blog", "index.html")
+        write(self.page, PAGE)
+        write(os.path.join(self.docs, "index.css"), "body{}")
+        write(os.path.join(self.docs, "images", "a.png"), "png" * 1000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writes_sidecars_for_large_pages_only(self):
+        self.assertEqual(compress_outputs(self.docs, min_bytes=100), (1, 0, 0))
+        with gzip.open(self.page + ".gz", "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), PAGE)
+        for suffix in sidecar_suffixes():
+            self.assertTrue(os.path.exists(self.page + suffix))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images", "a.png.gz")))
+
+    def test_gzip_output_is_deterministic(self):
+        compress_outputs(self.docs, min_bytes=100)
+        with open(self.page + ".gz", "rb") as f:
+            first = f.read()
+        os.remove(self.page + ".gz")
+        compress_outputs(self.docs, min_bytes=100)
+        with open(self.page + ".gz", "rb") as f:
+            self.assertEqual(f.read(), first)
+
+    def test_unchanged_pages_are_not_compressed_again(self):
+        compress_outputs(self.docs, min_bytes=100)
+        self.assertEqual(compress_outputs(self.docs, min_bytes=100), (0, 1, 0))
+
+        write(self.page, PAGE + "<p>more</p>")
+        os.utime(self.page, ns=(0, os.stat(self.page).st_mtime_ns + 1))
+        self.assertEqual(compress_outputs(self.docs, min_bytes=100), (1, 0, 0))
+        with gzip.open(self.page + ".gz", "rt", encoding="utf-8") as f:
+            self.assertTrue(f.read().endswith("<p>more</p>"))
+
+    def test_sidecars_of_removed_or_shrunk_pages_are_removed(self):
+        other = os.path.join(self.docs, "other.html")
+        write(other, PAGE)
+        compress_outputs(self.docs, min_bytes=100)
+        os.remove(other)
+        write(self.page, "<p>short</p>")
+        written, _, removed = compress_outputs(self.docs, min_bytes=100)
+        self.assertEqual((written, removed), (0, 2 * len(sidecar_suffixes())))
+        self.assertFalse(os.path.exists(other + ".gz"))
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_in_worker_processes(self):
+        for i in range(compress.CHUNK_SIZE + 1):
+            write(os.path.join(self.docs, f"{i}.html"), PAGE)
+        written, _, _ = compress_outputs(self.docs, jobs=2, min_bytes=100)
+        self.assertEqual(written, compress.CHUNK_SIZE + 2)
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "0.html.gz")))
+
+    def test_without_brotli_only_gzip_is_written(self):
+        write(self.page + ".br", "old")
+        with mock.patch.object(compress, "brotli", None):
+            compress_outputs(self.docs, min_bytes=100)
+        self.assertTrue(os.path.exists(self.page + ".gz"))
+        # a .br no longer kept current is removed rather than left stale
+        self.assertFalse(os.path.exists(self.page + ".br"))
+
+    def test_remove_sidecars(self):
+        compress_outputs(self.docs, min_bytes=100)
+        write(os.path.join(self.docs, "archive.tar.gz"), "x")
+        self.assertEqual(remove_sidecars(self.docs), len(sidecar_suffixes()))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "archive.tar.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
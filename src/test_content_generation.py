@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
-from content_generation import extract_title
+from content_generation import extract_title, find_content_pages, generate_pages, render_page, stream_page, write_if_changed
+from minify import disable_minification, enable_minification
 
 class TestExtractTitle(unittest.TestCase):
     def test_simple_title(self):
@@ -28,5 +31,154 @@ Me llamo diego
         with self.assertRaises(Exception):
             extract_title(markdown)
 
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write('<title>{{ Title }}</title><a href="/x">{{ Content }}</a>')
+        sources = {
+            "index.md": "# Home\n\nWelcome **home**",
+            "blog/post/index.md": "# Post\n\n- one\n- two",
+            "broken/index.md": "no heading here",
+        }
+        for rel_path, text in sources.items():
+            path = os.path.join(self.root, "content", rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, dest_name, jobs):
+        pages = find_content_pages(
+            os.path.join(self.root, "content"), os.path.join(self.root, dest_name), self.template
+        )
+        errors, _ = generate_pages(pages, "/base/", jobs=jobs, chunk_size=1)
+        outputs = {}
+        for _, dest_path, _ in pages:
+            if os.path.exists(dest_path):
+                with open(dest_path, "rb") as f:
+                    outputs[os.path.relpath(dest_path, os.path.join(self.root, dest_name))] = f.read()
+        return errors, outputs
+
+    def test_errors_are_collected_per_page(self):
+        errors, outputs = self.build("serial", jobs=1)
+        self.assertEqual([os.path.basename(os.path.dirname(p)) for p, _ in errors], ["broken"])
+        self.assertEqual(
+            outputs[os.path.join("index.html")],
+            b'<title>Home</title><a href="/base/x"><div><h1>Home</h1><p>Welcome <b>home</b></p></div></a>',
+        )
+        self.assertIn(os.path.join("blog", "post", "index.html"), outputs)
+
+    def test_parallel_output_matches_serial(self):
+        serial_errors, serial = self.build("serial", jobs=1)
+        parallel_errors, parallel = self.build("parallel", jobs=2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(serial_errors), len(parallel_errors))
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        pages = find_content_pages(
+            os.path.join(self.root, "content"), os.path.join(self.root, "docs"), self.template
+        )
+        _, written = generate_pages(pages, "/base/")
+        self.assertEqual(len(written), 2)
+        index_path = os.path.join(self.root, "docs", "index.html")
+        os.utime(index_path, ns=(0, 0))
+        with open(os.path.join(self.root, "content", "blog", "post", "index.md"), "w", encoding="utf-8") as f:
+            f.write("# Post\n\n- one\n- three")
+
+        _, written = generate_pages(pages, "/base/")
+
+        self.assertEqual(written, [os.path.join(self.root, "docs", "blog", "post", "index.html")])
+        self.assertEqual(os.stat(index_path).st_mtime_ns, 0)
+
+class TestWriteIfChanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out", "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writes_only_when_content_differs(self):
+        self.assertTrue(write_if_changed(self.path, "<p>é</p>"))
+        self.assertFalse(write_if_changed(self.path, "<p>é</p>"))
+        # same length, different bytes
+        self.assertTrue(write_if_changed(self.path, "<p>e!</p>"))
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>e!</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+class TestStreamPage(unittest.TestCase):
+    markdown = """Intro before the title
+
+# Changelog
+
+## 1.1 with a [link](/docs)
+
+- fixed **bold** bug
+- added ![img](/a.png)
+
+```
+code block
+```
+
+> quoted _text_
+"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "changelog.md")
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write(self.markdown)
+        self.dest = os.path.join(self.tmp.name, "docs", "changelog", "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def template(self, text):
+        path = os.path.join(self.tmp.name, "template.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def read(self):
+        with open(self.dest, encoding="utf-8") as f:
+            return f.read()
+
+    def test_matches_in_memory_render(self):
+        template = self.template('<title>{{ Title }}</title><a href="/">{{ Content }}</a>')
+        self.assertTrue(stream_page(self.source, template, self.dest, "/base/"))
+        self.assertEqual(self.read(), render_page(self.markdown, template, "/base/"))
+        self.assertFalse(stream_page(self.source, template, self.dest, "/base/"))
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+
+    def test_minified_stream_matches_in_memory_render(self):
+        template = self.template("<html>\n  <body>\n    <main>{{ Content }}</main>\n  </body>\n</html>\n")
+        stats = enable_minification()
+        self.addCleanup(disable_minification)
+        stream_page(self.source, template, self.dest, "/")
+        self.assertEqual(self.read(), render_page(self.markdown, template, "/"))
+        self.assertIn("<pre><code>code block\n</code></pre>", self.read())
+        self.assertEqual(stats.pages, 2)
+        self.assertEqual(stats.bytes_in - stats.bytes_out, 2 * (len("\n  \n    ") + len("\n  \n\n")))
+
+    def test_template_using_content_twice(self):
+        template = self.template("{{ Content }}<hr>{{ Content }}")
+        stream_page(self.source, template, self.dest, "/")
+        self.assertEqual(self.read(), render_page(self.markdown, template, "/"))
+
+    def test_missing_title_raises(self):
+        template = self.template("{{ Content }}")
+        with open(self.source, "w", encoding="utf-8") as f:
+            f.write("no title")
+        with self.assertRaises(Exception):
+            stream_page(self.source, template, self.dest, "/")
+        self.assertFalse(os.path.exists(os.path.dirname(self.dest)))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
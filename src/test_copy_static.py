@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from copy_static import copy_source_content_to_destination, delete_destination_contents, sync_source_content_to_destination
+
+
+class TestSyncStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "static")
+        self.destination = os.path.join(self.tmp.name, "docs")
+        self.write("index.css", "body {}")
+        self.write("images/a.png", "png-a")
+        self.write("images/b.png", "png-b")
+        os.makedirs(self.destination)
+        # a generated page that the sync must never prune
+        with open(os.path.join(self.destination, "index.html"), "w") as f:
+            f.write("<html></html>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.source, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.destination, rel_path)) as f:
+            return f.read()
+
+    def test_first_sync_copies_everything(self):
+        files, summary = sync_source_content_to_destination(self.source, self.destination)
+        self.assertEqual(sorted(files), [os.path.join("images", "a.png"), os.path.join("images", "b.png"), "index.css"])
+        self.assertEqual(summary["copied"], 3)
+        self.assertEqual(self.read("images/a.png"), "png-a")
+
+    def test_second_sync_skips_unchanged_and_prunes_removed(self):
+        files, _ = sync_source_content_to_destination(self.source, self.destination)
+        self.write("index.css", "body { color: red; }")
+        os.remove(os.path.join(self.source, "images", "b.png"))
+
+        _, summary = sync_source_content_to_destination(self.source, self.destination, files)
+
+        self.assertEqual((summary["copied"], summary["skipped"], summary["deleted"]), (1, 1, 1))
+        self.assertEqual(self.read("index.css"), "body { color: red; }")
+        self.assertFalse(os.path.exists(os.path.join(self.destination, "images", "b.png")))
+        self.assertEqual(self.read("index.html"), "<html></html>")
+
+    def test_checksum_catches_same_size_and_mtime(self):
+        files, _ = sync_source_content_to_destination(self.source, self.destination, checksum=True)
+        dest_path = os.path.join(self.destination, "index.css")
+        stat = os.stat(dest_path)
+        with open(dest_path, "w") as f:
+            f.write("body {!")
+        os.utime(dest_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        _, summary = sync_source_content_to_destination(self.source, self.destination, files, checksum=True)
+
+        self.assertEqual(summary["copied"], 1)
+        self.assertEqual(self.read("index.css"), "body {}")
+
+    def test_skipped_files_are_recorded_but_not_copied(self):
+        skip = {os.path.join("images", "a.png")}
+        files, summary = sync_source_content_to_destination(self.source, self.destination, skip=skip)
+        self.assertIn(os.path.join("images", "a.png"), files)
+        self.assertEqual(summary["copied"], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.destination, "images", "a.png")))
+
+    def test_links_do_not_write_through_to_source(self):
+        sync_source_content_to_destination(self.source, self.destination, use_links=True)
+        sync_source_content_to_destination(self.source, self.destination, use_links=False)
+        dest_path = os.path.join(self.destination, "index.css")
+        with open(dest_path, "w") as f:
+            f.write("changed in docs")
+        with open(os.path.join(self.source, "index.css")) as f:
+            self.assertEqual(f.read(), "body {}")
+
+
+class TestCopyAndDelete(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "static")
+        self.destination = os.path.join(self.tmp.name, "docs")
+        os.makedirs(self.destination)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_tree(self, root):
+        expected = {}
+        for i in range(40):
+            rel_path = os.path.join(f"d{i % 4}", f"sub{i % 3}", f"f{i}.txt")
+            path = os.path.join(root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("x" * i)
+            expected[rel_path] = "x" * i
+        return expected
+
+    def test_parallel_copy_then_delete(self):
+        expected = self.make_tree(self.source)
+
+        summary = copy_source_content_to_destination(self.source, self.destination, workers=4)
+
+        self.assertEqual((summary["files"], summary["bytes"]), (40, sum(range(40))))
+        for rel_path, text in expected.items():
+            with open(os.path.join(self.destination, rel_path)) as f:
+                self.assertEqual(f.read(), text)
+
+        summary = delete_destination_contents(self.destination, workers=4)
+        self.assertEqual(summary["files"], 40)
+        self.assertEqual(os.listdir(self.destination), [])
+
+    def test_deeper_than_the_recursion_limit(self):
+        deep = self.source
+        os.mkdir(deep)
+        for _ in range(300):
+            deep = os.path.join(deep, "d")
+            os.mkdir(deep)
+        with open(os.path.join(deep, "leaf.txt"), "w") as f:
+            f.write("leaf")
+
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            copy_source_content_to_destination(self.source, self.destination, workers=2)
+            copied = os.path.exists(os.path.join(self.destination, *["d"] * 300, "leaf.txt"))
+            delete_destination_contents(self.destination, workers=2)
+        finally:
+            sys.setrecursionlimit(limit)
+
+        self.assertTrue(copied)
+        self.assertEqual(os.listdir(self.destination), [])
+
+    def test_delete_removes_symlinks_without_following_them(self):
+        expected = self.make_tree(self.source)
+        os.symlink(self.source, os.path.join(self.destination, "linked"))
+
+        delete_destination_contents(self.destination, workers=1)
+
+        self.assertEqual(os.listdir(self.destination), [])
+        self.assertTrue(all(os.path.exists(os.path.join(self.source, p)) for p in expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
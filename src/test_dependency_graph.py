@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from dependency_graph import DependencyGraph, local_references, record_page_references
+
+
+class TestLocalReferences(unittest.TestCase):
+    def test_only_paths_under_basepath(self):
+        html = (
+            '<link href="/site/index.css"><img src="/site/images/a%20b.png" alt="x">'
+            '<a href="https://example.com/x">out</a><a href="/site/blog/#top">blog</a>'
+            '<a href="/site/">home</a>'
+        )
+        self.assertEqual(
+            local_references(html, "/site/"),
+            [os.path.join("blog"), os.path.join("images", "a b.png"), "index.css"],
+        )
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.manifest = {
+            "basepath": "/",
+            "static": {"index.css": {}, os.path.join("images", "a.png"): {}},
+            "templates": {},
+            "pages": {
+                "./content/index.md": {
+                    "output": "./docs/index.html",
+                    "template": "./template.html",
+                    "references": ["index.css", os.path.join("images", "a.png")],
+                },
+                "./content/blog/index.md": {
+                    "output": "./docs/blog/index.html",
+                    "template": "./content/blog/template.html",
+                    # images/new.png is not a static file (yet)
+                    "references": ["index.css", os.path.join("images", "new.png")],
+                },
+            },
+        }
+        self.graph = DependencyGraph(self.manifest, "./static", "./docs")
+
+    def test_page(self):
+        self.assertEqual(self.graph.affected_by("content/index.md"), ("page", ["./docs/index.html"], []))
+
+    def test_template(self):
+        self.assertEqual(
+            self.graph.affected_by("./template.html"), ("template", ["./docs/index.html"], [])
+        )
+
+    def test_static_file(self):
+        kind, rebuilt, referencing = self.graph.affected_by("static/index.css")
+        self.assertEqual((kind, rebuilt), ("static", [os.path.join("./docs", "index.css")]))
+        self.assertEqual(referencing, ["content/blog/index.md", "content/index.md"])
+        self.assertEqual(self.graph.affected_by("static/images/a.png")[2], ["content/index.md"])
+
+    def test_unknown(self):
+        self.assertEqual(self.graph.affected_by("static/images/new.png"), ("unknown", [], []))
+        self.assertEqual(self.graph.affected_by("../outside.md"), ("unknown", [], []))
+
+
+class TestRecordPageReferences(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "index.html")
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write('<img src="/a.png">')
+        self.pages = [("index.md", self.output, "template.html")]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_new_and_rewritten_outputs_only(self):
+        manifest = {"basepath": "/", "pages": {"index.md": {"output": self.output}}}
+        record_page_references(manifest, self.pages, written=[])
+        self.assertEqual(manifest["pages"]["index.md"]["references"], ["a.png"])
+
+        manifest["pages"]["index.md"]["references"] = ["kept.png"]
+        record_page_references(manifest, self.pages, written=[])
+        self.assertEqual(manifest["pages"]["index.md"]["references"], ["kept.png"])
+
+        record_page_references(manifest, self.pages, written=[self.output])
+        self.assertEqual(manifest["pages"]["index.md"]["references"], ["a.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
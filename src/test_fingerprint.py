@@ -0,0 +1,180 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fingerprint
+import main
+
+from build_manifest import empty_manifest, plan_incremental_build
+from fingerprint import (
+    asset_names,
+    fingerprint_static,
+    fingerprinted_name,
+    load_asset_manifest,
+    remove_fingerprinted_outputs,
+)
+from templates import load_template, rewrite_links, set_asset_names
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestFingerprintedName(unittest.TestCase):
+    def test_hash_before_extension(self):
+        self.assertEqual(
+            fingerprinted_name(os.path.join("css", "index.css"), "3fa2c1d0ffff"),
+            os.path.join("css", "index.3fa2c1d0.css"),
+        )
+
+    def test_pages_keep_their_names(self):
+        self.assertEqual(fingerprinted_name("about.html", "3fa2c1d0ffff"), "about.html")
+
+
+class TestFingerprintStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        write(os.path.join(self.static, "index.css"), "body {}")
+        write(os.path.join(self.static, "images", "a.png"), "png")
+        os.makedirs(self.docs)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publishes_hashed_copies_and_manifest(self):
+        assets = fingerprint_static(self.static, self.docs)
+        output = assets["index.css"]["output"]
+        self.assertRegex(output, r"^index\.[0-9a-f]{8}\.css$")
+        with open(os.path.join(self.docs, output), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "body {}")
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.css")))
+        self.assertEqual(load_asset_manifest(self.docs), assets)
+
+    def test_unchanged_files_are_not_hashed_or_copied_again(self):
+        previous = fingerprint_static(self.static, self.docs)
+        # a bogus hash is kept as long as size and mtime match
+        previous["index.css"]["hash"] = "f" * 64
+        previous["index.css"]["output"] = fingerprinted_name("index.css", "f" * 64)
+        write(os.path.join(self.docs, previous["index.css"]["output"]), "body {}")
+        assets = fingerprint_static(self.static, self.docs, previous)
+        self.assertEqual(assets["index.css"]["output"], "index.ffffffff.css")
+
+    def test_changed_file_gets_new_name_and_old_one_is_removed(self):
+        previous = fingerprint_static(self.static, self.docs)
+        write(os.path.join(self.static, "index.css"), "body { color: red }")
+        assets = fingerprint_static(self.static, self.docs, previous)
+        self.assertNotEqual(assets["index.css"]["output"], previous["index.css"]["output"])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, previous["index.css"]["output"])))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, assets["index.css"]["output"])))
+
+    def test_plain_copies_are_replaced(self):
+        write(os.path.join(self.docs, "index.css"), "body {}")
+        fingerprint_static(self.static, self.docs, {"index.css": {"size": 7, "mtime_ns": 0}})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.css")))
+
+    def test_hard_linked_copies_are_replaced(self):
+        write(os.path.join(self.static, "about.html"), "<p>about</p>")
+        source_path = os.path.join(self.static, "about.html")
+        dest_path = os.path.join(self.docs, "about.html")
+        os.link(source_path, dest_path)
+        fingerprint_static(self.static, self.docs)
+        self.assertFalse(os.path.samefile(source_path, dest_path))
+        with open(source_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>about</p>")
+
+    def test_remove_fingerprinted_outputs(self):
+        assets = fingerprint_static(self.static, self.docs)
+        remove_fingerprinted_outputs(self.docs, assets)
+        self.assertEqual(os.listdir(self.docs), [])
+
+
+class TestAssetNames(unittest.TestCase):
+    def tearDown(self):
+        set_asset_names({})
+
+    def test_links_are_renamed_before_basepath(self):
+        set_asset_names({"index.css": "index.3fa2c1d0.css"})
+        html = '<link href="/index.css"><a href="/index.css#x">x</a><a href="/blog/">b</a>'
+        self.assertEqual(
+            rewrite_links(html, "/site/"),
+            '<link href="/site/index.3fa2c1d0.css"><a href="/site/index.3fa2c1d0.css#x">x</a>'
+            '<a href="/site/blog/">b</a>',
+        )
+
+    def test_only_renamed_files_are_listed(self):
+        assets = {
+            "index.css": {"output": "index.3fa2c1d0.css"},
+            "about.html": {"output": "about.html"},
+        }
+        self.assertEqual(asset_names(assets), {"index.css": "index.3fa2c1d0.css"})
+
+    def test_templates_recompile_for_new_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template_path = os.path.join(tmp, "template.html")
+            write(template_path, '<link href="/index.css">{{ Content }}')
+            set_asset_names({"index.css": "index.aaaaaaaa.css"})
+            self.assertIn("index.aaaaaaaa.css", load_template(template_path, "/").render({}))
+            set_asset_names({"index.css": "index.bbbbbbbb.css"})
+            self.assertIn("index.bbbbbbbb.css", load_template(template_path, "/").render({}))
+
+
+class TestRenamedAssetsRebuildPages(unittest.TestCase):
+    def test_pages_linking_to_renamed_file_are_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template_path = os.path.join(tmp, "template.html")
+            write(template_path, "{{ Content }}")
+            pages = []
+            for name in ("a", "b"):
+                source_path = os.path.join(tmp, f"{name}.md")
+                dest_path = os.path.join(tmp, f"{name}.html")
+                write(source_path, "# x")
+                write(dest_path, "x")
+                pages.append((source_path, dest_path, template_path))
+
+            names = {"index.css": "index.aaaaaaaa.css"}
+            _, _, previous = plan_incremental_build(pages, None, "/", assets=names)
+            previous["pages"][pages[0][0]]["references"] = ["index.aaaaaaaa.css"]
+            previous["pages"][pages[1][0]]["references"] = []
+
+            names = {"index.css": "index.bbbbbbbb.css"}
+            to_build, _, manifest = plan_incremental_build(pages, previous, "/", assets=names)
+            self.assertEqual(to_build, [pages[0]])
+            self.assertEqual(manifest["assets"], {"index.css": "index.bbbbbbbb.css"})
+
+            to_build, _, _ = plan_incremental_build(pages, manifest, "/", assets=manifest["assets"])
+            self.assertEqual(to_build, [])
+
+    def test_empty_manifest_has_no_assets(self):
+        self.assertEqual(empty_manifest("/")["assets"], {})
+
+
+class TestFullBuild(unittest.TestCase):
+    def test_unchanged_files_are_not_hashed_again(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                write(os.path.join("content", "index.md"), "# Home")
+                write(os.path.join("static", "index.css"), "body {}")
+                write(main.template_path, '<link href="/index.css">{{ Content }}')
+                args = main.parse_args(["--fingerprint"])
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main.build(args, None)
+                    with mock.patch("fingerprint.hash_file", wraps=fingerprint.hash_file) as hash_file:
+                        main.build(args, None)
+                hash_file.assert_not_called()
+                self.assertEqual(len(load_asset_manifest("docs")), 1)
+            finally:
+                os.chdir(cwd)
+                set_asset_names({})
+
+
+if __name__ == "__main__":
+    unittest.main()
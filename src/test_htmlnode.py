@@ -1,3 +1,4 @@
+import io
 import unittest
 from htmlnode import HTMLNode, LeafNode, ParentNode
 
@@ -62,6 +63,12 @@ class TestHTMLNode(unittest.TestCase):
             None,
         )
 
+    def test_nodes_are_slotted_with_interned_tags(self):
+        tag = "".join(["d", "iv"])
+        for node in (HTMLNode(tag), LeafNode(tag, "x"), ParentNode(tag, [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+            self.assertIs(node.tag, "div")
+
     def test_repr(self):
         node = HTMLNode(
             "p",
@@ -108,5 +115,28 @@ class TestParentNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
         )
 
+    def test_write_html_matches_to_html(self):
+        items = [ParentNode("li", [LeafNode("b", f"item {i}"), LeafNode(None, " text")]) for i in range(3)]
+        node = ParentNode("ul", items, {"class": "list"})
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(sink.getvalue(), node.to_html())
+        self.assertEqual(
+            node.to_html(),
+            '<ul class="list"><li><b>item 0</b> text</li><li><b>item 1</b> text</li><li><b>item 2</b> text</li></ul>',
+        )
+
+    def test_to_html_deep_tree(self):
+        node = LeafNode(None, "deep")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 5000 + "deep</span>"))
+
+    def test_to_html_invalid_nested_child(self):
+        node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
 if __name__ == "__main__":
     unittest.main()
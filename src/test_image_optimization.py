@@ -0,0 +1,140 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+import image_optimization
+from copy_static import sync_source_content_to_destination
+from image_optimization import image_attributes, optimize_images, png_size, variant_name
+
+
+def png_bytes(width, height):
+    """A valid, all black RGB PNG, written without Pillow."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\0" + b"\0" * (3 * width) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+class TestImageHelpers(unittest.TestCase):
+    def test_png_size(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.png")
+            with open(path, "wb") as f:
+                f.write(png_bytes(64, 32))
+            self.assertEqual(png_size(path), (64, 32))
+            with open(path, "wb") as f:
+                f.write(b"not a png at all, but long enough")
+            self.assertIsNone(png_size(path))
+
+    def test_variant_name(self):
+        self.assertEqual(
+            variant_name(os.path.join("images", "a.3fa2c1d0.png"), 480),
+            os.path.join("images", "a.3fa2c1d0-480w.png"),
+        )
+
+
+class TestOptimizeImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.docs)
+        self.write_png("images/wide.png", 1000, 50)
+        self.write_png("images/small.png", 100, 50)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_png(self, rel_path, width, height):
+        with open(os.path.join(self.static, rel_path), "wb") as f:
+            f.write(png_bytes(width, height))
+
+    def optimize(self, previous=None, widths=(200, 500)):
+        return optimize_images(self.static, self.docs, previous=previous, widths=widths, cache_dir=self.cache_dir)
+
+    def test_without_pillow_only_sizes_are_known(self):
+        with mock.patch.object(image_optimization, "Image", None):
+            images = self.optimize()
+        self.assertEqual(
+            image_attributes(images),
+            {
+                "/images/small.png": {"width": "100", "height": "50"},
+                "/images/wide.png": {"width": "1000", "height": "50"},
+            },
+        )
+        self.assertEqual(os.listdir(self.docs), [])
+
+    @unittest.skipUnless(image_optimization.pillow_available(), "Pillow is not installed")
+    def test_variants_and_srcset(self):
+        images = self.optimize()
+        wide = images[os.path.join("images", "wide.png")]
+        self.assertEqual(
+            wide["variants"],
+            [os.path.join("images", "wide-200w.png"), os.path.join("images", "wide-500w.png")],
+        )
+        self.assertEqual(
+            wide["attributes"]["srcset"],
+            "/images/wide-200w.png 200w, /images/wide-500w.png 500w, /images/wide.png 1000w",
+        )
+        self.assertEqual(png_size(os.path.join(self.docs, "images", "wide-200w.png")), (200, 10))
+        # narrower than every variant width: sizes only
+        small = images[os.path.join("images", "small.png")]
+        self.assertEqual(small["attributes"], {"width": "100", "height": "50"})
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "images", "small.png")))
+
+    @unittest.skipUnless(image_optimization.pillow_available(), "Pillow is not installed")
+    def test_rerun_uses_cache_and_prunes_dropped_variants(self):
+        previous = self.optimize()
+        with mock.patch.object(image_optimization, "_encode_image") as encode:
+            again = self.optimize(previous)
+        encode.assert_not_called()
+        self.assertEqual(again, previous)
+
+        self.optimize(previous, widths=(200,))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images", "wide-500w.png")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "images", "wide-200w.png")))
+
+    @unittest.skipUnless(image_optimization.pillow_available(), "Pillow is not installed")
+    def test_published_under_fingerprinted_name(self):
+        images = optimize_images(
+            self.static,
+            self.docs,
+            published={"images/wide.png": "images/wide.3fa2c1d0.png"},
+            widths=(200,),
+            cache_dir=self.cache_dir,
+        )
+        self.assertEqual(
+            images[os.path.join("images", "wide.png")]["attributes"]["srcset"],
+            "/images/wide.3fa2c1d0-200w.png 200w, /images/wide.3fa2c1d0.png 1000w",
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "images", "wide.3fa2c1d0.png")))
+
+    @unittest.skipUnless(image_optimization.pillow_available(), "Pillow is not installed")
+    def test_hard_linked_copies_are_replaced_not_written_through(self):
+        # an earlier --static-links build linked the images into docs/
+        sync_source_content_to_destination(self.static, self.docs, use_links=True)
+        source_path = os.path.join(self.static, "images", "wide.png")
+        dest_path = os.path.join(self.docs, "images", "wide.png")
+        self.assertTrue(os.path.samefile(source_path, dest_path))
+        with open(source_path, "rb") as f:
+            original = f.read()
+
+        self.optimize()
+        self.assertFalse(os.path.samefile(source_path, dest_path))
+        with open(source_path, "rb") as f:
+            self.assertEqual(f.read(), original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from inline_markdown import (
@@ -6,7 +7,8 @@ from inline_markdown import (
     extract_markdown_links, 
     split_nodes_image, 
     split_nodes_link, 
-    text_to_textnodes
+    text_to_textnodes,
+    split_text_to_textnodes,
 )
 
 from textnode import TextNode, TextType
@@ -307,5 +309,61 @@ class TestTextToTextnodes(unittest.TestCase):
     
 
 
+class TestSinglePassTokenizer(unittest.TestCase):
+    fragments = [
+        "plain words ", "more text, ", "**bold**", "**two words**", "_italic_",
+        "_more italic_", "`code()`", "`x = 1`", "![alt](https://a.com/i.png)",
+        "[link](https://a.com)", "[empty]()", "! ", "[not a link] ", "(parens) ",
+        "![](/img.png)", "****", "``", "* ", "a*b ", "!!", "!",
+    ]
+
+    def test_matches_multipass_pipeline(self):
+        rng = random.Random(1234)
+        for _ in range(2000):
+            text = "".join(rng.choice(self.fragments) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(split_text_to_textnodes(text), text_to_textnodes(text), text)
+
+    def test_unclosed_delimiter_raises(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("this is **not closed")
+
+    def test_plain_text_is_passed_through(self):
+        node = TextNode("no markup here, not even a * or !", TextType.TEXT)
+        nodes = [node]
+        for split in (
+            lambda nodes: split_nodes_delimiter(nodes, "**", TextType.BOLD),
+            split_nodes_image,
+            split_nodes_link,
+        ):
+            nodes = split(nodes)
+            self.assertIs(nodes[0], node)
+        self.assertEqual(text_to_textnodes(node.text), [node])
+        self.assertEqual(text_to_textnodes(""), [])
+
+    def test_underscore_inside_link_url(self):
+        nodes = text_to_textnodes("see [docs](https://a.com/some_page_here) now")
+        self.assertEqual(
+            nodes,
+            [
+                TextNode("see ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "https://a.com/some_page_here"),
+                TextNode(" now", TextType.TEXT),
+            ],
+        )
+
+    def test_nested_emphasis(self):
+        nodes = text_to_textnodes("**bold and _italic_**")
+        self.assertEqual(len(nodes), 1)
+        self.assertEqual(nodes[0].text_type, TextType.BOLD)
+        self.assertEqual(
+            nodes[0].children,
+            [TextNode("bold and ", TextType.TEXT), TextNode("italic", TextType.ITALIC)],
+        )
+
+    def test_unbalanced_markup_inside_emphasis_stays_literal(self):
+        nodes = text_to_textnodes("**snake_case**")
+        self.assertEqual(nodes, [TextNode("snake_case", TextType.BOLD)])
+
+
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
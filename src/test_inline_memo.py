@@ -0,0 +1,69 @@
+import sys
+import unittest
+
+from inline_memo import InlineMemo, active_inline_memo, disable_inline_memo, enable_inline_memo
+from markdown_blocks import markdown_to_html_node
+
+
+class TestInlineMemo(unittest.TestCase):
+    def test_counts_hits_and_misses(self):
+        memo = InlineMemo()
+        self.assertIsNone(memo.get("**a**"))
+        memo.put("**a**", "<b>a</b>")
+        self.assertEqual(memo.get("**a**"), "<b>a</b>")
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+
+    def test_evicts_least_recently_used_past_the_cap(self):
+        entry_bytes = sys.getsizeof("k0") + sys.getsizeof("v0") + 100
+        memo = InlineMemo(max_bytes=entry_bytes * 2)
+        memo.put("k0", "v0")
+        memo.put("k1", "v1")
+        memo.get("k0")
+        memo.put("k2", "v2")
+
+        self.assertEqual(len(memo), 2)
+        self.assertIsNone(memo.get("k1"))
+        self.assertEqual(memo.get("k0"), "v0")
+        self.assertLessEqual(memo.total_bytes, memo.max_bytes)
+
+    def test_entry_larger_than_the_cap_is_not_kept(self):
+        memo = InlineMemo(max_bytes=64)
+        memo.put("text", "x" * 1000)
+        self.assertEqual(len(memo), 0)
+
+
+class TestMemoizedRendering(unittest.TestCase):
+    markdown = """# Title with **bold**
+
+- [Home](/)
+- [Blog](/blog) and _more_
+
+> quoted `code`
+
+- [Home](/)
+- [Blog](/blog) and _more_
+"""
+
+    def tearDown(self):
+        disable_inline_memo()
+
+    def test_same_html_with_and_without_memo(self):
+        expected = markdown_to_html_node(self.markdown).to_html()
+        memo = enable_inline_memo()
+        self.assertIs(active_inline_memo(), memo)
+
+        self.assertEqual(markdown_to_html_node(self.markdown).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(self.markdown).to_html(), expected)
+        # two repeated list items on the first pass, everything on the second
+        self.assertEqual((memo.hits, memo.misses), (2 + 6, 4))
+
+    def test_unclosed_delimiter_still_raises(self):
+        enable_inline_memo()
+        with self.assertRaises(Exception):
+            markdown_to_html_node("this is **not closed")
+        with self.assertRaises(Exception):
+            markdown_to_html_node("this is **not closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,17 @@
+import io
 import unittest
-from markdown_blocks import markdown_to_blocks, BlockType, block_to_block_type, markdown_to_html_node
+from markdown_blocks import (
+    markdown_to_blocks,
+    BlockType,
+    block_to_block_type,
+    markdown_to_html_node,
+    iter_blocks,
+    iter_block_html_nodes,
+    markdown_to_html_batch,
+    RenderResult,
+)
+from concurrent.futures import ProcessPoolExecutor
+from inline_memo import disable_inline_memo, enable_inline_memo
 
 class TestMarkdownBlocks(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -179,5 +191,79 @@ the **same** even with inline stuff
             "<div><ol><li>This is quote with another paragraph with italic text and code here</li><li>This is the same quote but with paragraph on a new line</li><li>This is more text</li><li>And this is more text</li></ol></div>",
         )   
 
+class TestIterBlocks(unittest.TestCase):
+    md = """# Title
+Intro line
+second intro line
+
+- one
+- two
+
+
+```
+code
+```
+"""
+
+    def test_iter_blocks_types_and_spans(self):
+        blocks = list(iter_blocks(io.StringIO(self.md)))
+        self.assertEqual(
+            [(b.block_type, b.start, b.end) for b in blocks],
+            [
+                (BlockType.HEADING, 1, 1),
+                (BlockType.PARAGRAPH, 2, 3),
+                (BlockType.UNORDERED_LIST, 5, 6),
+                (BlockType.CODE, 9, 11),
+            ],
+        )
+        self.assertEqual(blocks[1].lines, ["Intro line", "second intro line"])
+
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        md = "  # Heading\n   \n## Sub\ntext  \n\n\n \n> quote\n"
+        blocks = ["\n".join(b.lines) for b in iter_blocks(md.split("\n"))]
+        self.assertEqual(blocks, markdown_to_blocks(md))
+
+    def test_iter_block_html_nodes(self):
+        html = "".join(node.to_html() for node in iter_block_html_nodes(io.StringIO(self.md)))
+        self.assertEqual("<div>" + html + "</div>", markdown_to_html_node(self.md).to_html())
+
+class TestMarkdownToHtmlBatch(unittest.TestCase):
+    documents = [
+        "# One\n\nsome **bold**",
+        "broken **markup",
+        "- [Home](/)\n- [Blog](/blog)",
+        "",
+        "- [Home](/)\n- [Blog](/blog)",
+    ]
+
+    def expected(self):
+        results = []
+        for markdown in self.documents:
+            try:
+                results.append(RenderResult(markdown_to_html_node(markdown).to_html(), None))
+            except Exception:
+                results.append(RenderResult(None, "Exception: Invalid markdown syntax. Maybe close the delimiter?"))
+        return results
+
+    def tearDown(self):
+        disable_inline_memo()
+
+    def test_serial_batch_captures_errors_in_order(self):
+        results = markdown_to_html_batch(iter(self.documents))
+        self.assertEqual(results, self.expected())
+        self.assertIsNone(results[1].html)
+        self.assertEqual(results[3].html, "<div></div>")
+
+    def test_worker_pool_matches_serial(self):
+        memo = enable_inline_memo()
+        self.assertEqual(markdown_to_html_batch(self.documents, jobs=2, chunk_size=1), self.expected())
+        self.assertGreater(memo.hits + memo.misses, 0)
+
+    def test_caller_owned_executor_is_left_running(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for _ in range(2):
+                self.assertEqual(markdown_to_html_batch(self.documents, executor=executor), self.expected())
+
+
 if __name__ == "__main__":
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
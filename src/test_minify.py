@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+
+from minify import (
+    HtmlMinifier,
+    disable_minification,
+    enable_minification,
+    minify_css,
+    minify_html,
+    minify_static_css,
+    render_minified_page,
+)
+from templates import CompiledTemplate
+
+PAGE = """<!doctype html>
+<html>
+  <head>
+    <title>Title</title>
+  </head>
+  <body>
+    <article><div><p>Some   <b>bold</b>
+text and <code>x  =  1</code> here</p>
+<pre><code>def f():
+    return 1
+</code></pre>
+<p> after </p></div></article>
+  </body>
+</html>
+"""
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_collapses_whitespace_outside_pre_and_code(self):
+        self.assertEqual(
+            minify_html(PAGE),
+            "<!doctype html><html><head><title>Title</title></head><body><article><div>"
+            "<p>Some <b>bold</b> text and <code>x  =  1</code> here</p>"
+            "<pre><code>def f():\n    return 1\n</code></pre><p>after</p></div></article></body></html>",
+        )
+
+    def test_space_between_inline_tags_is_kept(self):
+        self.assertEqual(minify_html("<p><b>a</b>\n  <i>b</i></p>"), "<p><b>a</b> <i>b</i></p>")
+
+    def test_non_breaking_spaces_are_content(self):
+        self.assertEqual(minify_html("<td>\u00a0</td>"), "<td>\u00a0</td>")
+        self.assertEqual(minify_html("<b>x</b>\u00a0<i>y</i>"), "<b>x</b>\u00a0<i>y</i>")
+
+    def test_attribute_values_are_left_alone(self):
+        self.assertEqual(
+            minify_html('<p>\n  <img alt="a   b\nc" title="x > y  z">\n</p>'),
+            '<p><img alt="a   b\nc" title="x > y  z"></p>',
+        )
+
+    def test_streamed_in_pieces_matches_whole(self):
+        expected = minify_html(PAGE)
+        for size in range(1, 40):
+            minifier = HtmlMinifier()
+            pieces = [minifier.feed(PAGE[i:i + size]) for i in range(0, len(PAGE), size)]
+            pieces.append(minifier.finish())
+            self.assertEqual("".join(pieces), expected, size)
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_comments_and_whitespace(self):
+        css = """/* header, it's */
+h1,
+h2 {
+  color: #fff;
+  width: calc(100% - 2px);
+}
+
+a :hover { content: "a ;}  /* kept */"; }
+"""
+        self.assertEqual(
+            minify_css(css),
+            'h1,h2{color:#fff;width:calc(100% - 2px)}a :hover{content:"a ;}  /* kept */"}',
+        )
+
+    def test_comment_between_tokens_leaves_a_space(self):
+        self.assertEqual(minify_css("a{margin:1px/**/2px}"), "a{margin:1px 2px}")
+
+    def test_license_comments_are_kept(self):
+        self.assertEqual(
+            minify_css("/*! MIT licensed */\nbody {\n  margin: 0; /* reset */\n}\n"),
+            "/*! MIT licensed */ body{margin:0}",
+        )
+
+    def test_minify_static_css_publishes_under_published_name(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            static = os.path.join(tmp, "static")
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(static)
+            with open(os.path.join(static, "index.css"), "w", encoding="utf-8") as f:
+                f.write("body {\n  margin: 0;\n}\n")
+            files, bytes_in, bytes_out = minify_static_css(static, docs, {"index.css": "index.3fa2c1d0.css"})
+            with open(os.path.join(docs, "index.3fa2c1d0.css"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "body{margin:0}")
+            self.assertEqual((files, bytes_in, bytes_out), (1, 22, 14))
+
+
+class TestRenderMinifiedPage(unittest.TestCase):
+    def setUp(self):
+        self.stats = enable_minification()
+
+    def tearDown(self):
+        disable_minification()
+
+    def test_matches_minifying_whole_page(self):
+        template = CompiledTemplate(
+            "<html>\n  <title>{{ Title }}</title>\n  <body>\n    {{ Content }}\n  </body>\n</html>", "/site/"
+        )
+        values = {"Title": "Hello", "Content": '<div>\n<p>a  <a href="/x">b</a></p>\n</div>'}
+        html = render_minified_page(template, values)
+        self.assertEqual(html, minify_html(template.render(values)))
+        self.assertEqual(self.stats.bytes_in, len(template.render(values)))
+        self.assertEqual(self.stats.bytes_out, len(html))
+
+    def test_slot_inside_pre_minifies_whole_page(self):
+        template = CompiledTemplate("<body>\n  <pre>{{ Content }}</pre>\n</body>", "/")
+        values = {"Content": "a\n    b"}
+        self.assertEqual(render_minified_page(template, values), "<body><pre>a\n    b</pre></body>")
+
+    def test_disabled_renders_as_is(self):
+        disable_minification()
+        template = CompiledTemplate("<p>\n  {{ Content }}\n</p>", "/")
+        self.assertEqual(render_minified_page(template, {"Content": "x"}), "<p>\n  x\n</p>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling._profiler = None
+
+    def test_stage_is_free_when_disabled(self):
+        with profiling.stage("read"):
+            pass
+        self.assertIsNone(profiling.active_profiler())
+
+    def test_report_and_chrome_trace(self):
+        profiler = profiling.enable_profiling()
+        for page in ("a.md", "b.md"):
+            with profiling.stage("generate_page", page):
+                with profiling.stage("write"):
+                    pass
+        self.assertEqual([event[0] for event in profiler.events], ["write", "generate_page"] * 2)
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            profiler.report(top_n=1)
+        self.assertIn("2 pages", out.getvalue())
+        self.assertIn("Slowest 1 pages", out.getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        self.assertEqual(len(trace["traceEvents"]), 4)
+        self.assertEqual(trace["traceEvents"][1]["args"], {"page": "a.md"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from render_cache import RenderCache, cache_key, render_markdown
+from textnode import set_image_attributes
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_render_markdown_hit_matches_miss(self):
+        cache = RenderCache(self.directory)
+        md = "# Title\n\nSome **bold** text"
+        first = render_markdown(md, cache)
+        second = render_markdown(md, RenderCache(self.directory))
+        self.assertEqual(first, render_markdown(md))
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_key_changes_with_content(self):
+        self.assertNotEqual(cache_key("a"), cache_key("b"))
+        self.assertEqual(cache_key("a"), cache_key("a"))
+
+    def test_key_changes_with_image_attributes(self):
+        plain = cache_key("![a](/a.png)")
+        set_image_attributes({"/a.png": {"width": "10", "height": "10"}})
+        self.addCleanup(set_image_attributes, {})
+        self.assertNotEqual(cache_key("![a](/a.png)"), plain)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RenderCache(self.directory, max_bytes=25)
+        cache.put("a", "x" * 10)
+        cache.put("b", "y" * 10)
+        self.assertEqual(cache.get("a"), "x" * 10)
+        cache.put("c", "z" * 10)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertEqual(cache.get("c"), "z" * 10)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["a.html", "c.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
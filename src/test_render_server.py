@@ -0,0 +1,102 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+
+from render_server import LatencyStats, RenderServer
+
+
+class TestRenderServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w", encoding="utf-8") as f:
+            f.write('<title>{{ Title }}</title><a href="/">{{ Content }}</a>')
+        docs = os.path.join(self.tmp.name, "docs")
+        os.makedirs(docs)
+        with open(os.path.join(docs, "index.html"), "w", encoding="utf-8") as f:
+            f.write("built page")
+
+        self.server = RenderServer(("127.0.0.1", 0), self.template, "/site/", docs, max_pending=2)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None):
+        connection = HTTPConnection(*self.server.server_address[:2], timeout=10)
+        try:
+            connection.request(method, path, body=body.encode("utf-8") if body is not None else None)
+            response = connection.getresponse()
+            return response.status, response.read().decode("utf-8")
+        finally:
+            connection.close()
+
+    def test_renders_page_and_fragment(self):
+        self.assertEqual(
+            self.request("POST", "/render", "# Hi\n\n[a](/b)"),
+            (200, '<title>Hi</title><a href="/site/"><div><h1>Hi</h1><p><a href="/site/b">a</a></p></div></a>'),
+        )
+        self.assertEqual(self.request("POST", "/render?fragment=1", "**x**"), (200, "<div><p><b>x</b></p></div>"))
+
+    def test_errors_and_static_files(self):
+        status, body = self.request("POST", "/render", "no title")
+        self.assertEqual(status, 400)
+        self.assertIn("no valid title", body)
+        self.assertEqual(self.request("GET", "/index.html"), (200, "built page"))
+
+    def raw_request(self, head):
+        with socket.create_connection(self.server.server_address[:2], timeout=5) as connection:
+            connection.sendall(head.encode("ascii"))
+            return connection.recv(4096).decode("latin-1").split("\r\n", 1)[0]
+
+    def test_bad_content_length(self):
+        status = self.raw_request("POST /render HTTP/1.1\r\nContent-Length: lots\r\n\r\n")
+        self.assertIn(" 400 ", status)
+
+    def test_concurrent_requests_and_metrics(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda i: self.request("POST", "/render", f"# Page {i}"), range(40)))
+        self.assertTrue(all(status in (200, 503) for status, _ in results))
+
+        status, body = self.request("GET", "/metrics")
+        metrics = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(metrics["requests"] + metrics["rejected"], 40)
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+
+    def test_full_queue_is_rejected(self):
+        self.server.slots.acquire()
+        self.server.slots.acquire()
+        try:
+            self.assertEqual(self.request("POST", "/render", "# Hi")[0], 503)
+            # rejected before the body is read, so one that never arrives does not hold it up
+            status = self.raw_request("POST /render HTTP/1.1\r\nContent-Length: 1000000\r\n\r\n")
+            self.assertIn(" 503 ", status)
+        finally:
+            self.server.slots.release()
+            self.server.slots.release()
+        self.assertEqual(self.server.stats.rejected, 2)
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_percentiles(self):
+        stats = LatencyStats(window=100)
+        for ms in range(1, 101):
+            stats.begin()
+            stats.record(ms / 1000, ok=ms != 100)
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot["p50_ms"], snapshot["p99_ms"]), (51.0, 100.0))
+        self.assertEqual((snapshot["requests"], snapshot["errors"]), (100, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
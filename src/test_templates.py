@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from templates import CompiledTemplate, directory_template, load_template, rewrite_links
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    def test_render_matches_replace_chain(self):
+        source = '<title>{{ Title }}</title><link href="/index.css"><body>{{ Content }}</body>'
+        content = '<a href="/blog">blog</a><img src="/images/a.png" alt="a">'
+        expected = source.replace("{{ Title }}", "Hello").replace("{{ Content }}", content)
+        expected = expected.replace('href="/', 'href="/site/').replace('src="/', 'src="/site/')
+
+        actual = CompiledTemplate(source, "/site/").render({"Title": "Hello", "Content": content})
+
+        self.assertEqual(expected, actual)
+
+    def test_literals_are_rewritten_at_compile_time(self):
+        template = CompiledTemplate('<link href="/index.css">{{ Content }}', "/site/")
+        self.assertEqual(template.parts, ['<link href="/site/index.css">', "{{ Content }}", ""])
+
+    def test_arbitrary_and_missing_placeholders(self):
+        template = CompiledTemplate("{{ Author }} wrote {{ Title }}", "/")
+        self.assertEqual(template.render({"Author": "Tolkien"}), "Tolkien wrote {{ Title }}")
+
+    def test_url_slot_gets_basepath(self):
+        template = CompiledTemplate('<a href="{{ Url }}">x</a>', "/site/")
+        self.assertEqual(template.render({"Url": "/blog"}), '<a href="/site/blog">x</a>')
+
+    def test_srcset_candidates_get_basepath(self):
+        html = '<img src="/a.png" srcset="/a-480w.png 480w, https://cdn/a.png 960w, /a.png 1200w">'
+        self.assertEqual(
+            rewrite_links(html, "/site/"),
+            '<img src="/site/a.png" srcset="/site/a-480w.png 480w, https://cdn/a.png 960w, /site/a.png 1200w">',
+        )
+
+    def test_render_around(self):
+        template = CompiledTemplate('<title>{{ Title }}</title><a href="/">{{ Content }}</a>', "/site/")
+        self.assertEqual(
+            template.render_around({"Title": "Hi"}, "Content"),
+            ('<title>Hi</title><a href="/site/">', "</a>"),
+        )
+        self.assertIsNone(CompiledTemplate("{{ Content }}{{ Content }}", "/").render_around({}, "Content"))
+        self.assertIsNone(CompiledTemplate('<a href="{{ Content }}">', "/").render_around({}, "Content"))
+
+
+class TestTemplateLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_template_is_cached_until_file_changes(self):
+        path = os.path.join(self.root, "template.html")
+        with open(path, "w") as f:
+            f.write("<p>{{ Content }}</p>")
+        first = load_template(path, "/")
+        self.assertIs(first, load_template(path, "/"))
+
+        with open(path, "w") as f:
+            f.write("<div>{{ Content }}</div>")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(load_template(path, "/").render({"Content": "x"}), "<div>x</div>")
+
+    def test_directory_template_override(self):
+        default = os.path.join(self.root, "template.html")
+        self.assertEqual(directory_template(self.root, "default.html"), "default.html")
+        with open(default, "w") as f:
+            f.write("{{ Content }}")
+        self.assertEqual(directory_template(self.root, "default.html"), default)
+
+
+if __name__ == "__main__":
+    unittest.main()
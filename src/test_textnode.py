@@ -1,6 +1,6 @@
 import unittest
 
-from textnode import TextNode, TextType, text_node_to_html_node
+from textnode import TextNode, TextType, set_image_attributes, text_node_to_html_node
 
 
 class TestTextNode(unittest.TestCase):
@@ -40,6 +40,11 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("Click here", TextType.LINK, None)
         self.assertEqual(node, node2)
 
+    def test_slotted(self):
+        """Test that text nodes do not carry an instance dict"""
+        node = TextNode("This is a text node", TextType.BOLD)
+        self.assertFalse(hasattr(node, "__dict__"))
+
 class TestTextNodeToHTML(unittest.TestCase):
     
     def test_text(self):
@@ -70,6 +75,25 @@ class TestTextNodeToHTML(unittest.TestCase):
             html_node.props, 
             {"src": "https://umulabs.com/jozef_chen.png", "alt": "Image about Jozef Chen"}
             )
+
+    def test_image_with_attributes(self):
+        """Test that images given attributes by the image stage carry them"""
+        set_image_attributes({"/images/a.png": {"width": "640", "height": "480"}})
+        self.addCleanup(set_image_attributes, {})
+        html_node = text_node_to_html_node(TextNode("A", TextType.IMAGE, "/images/a.png"))
+        self.assertEqual(html_node.to_html(), '<img src="/images/a.png" alt="A" width="640" height="480"></img>')
+        other = text_node_to_html_node(TextNode("B", TextType.IMAGE, "/images/b.png"))
+        self.assertEqual(other.props, {"src": "/images/b.png", "alt": "B"})
+
+    def test_nested_bold(self):
+        """Test that bold text with nested markup converts to a parent node"""
+        node = TextNode(
+            "bold _italic_",
+            TextType.BOLD,
+            children=[TextNode("bold ", TextType.TEXT), TextNode("italic", TextType.ITALIC)],
+        )
+        html_node = text_node_to_html_node(node)
+        self.assertEqual(html_node.to_html(), "<b>bold <i>italic</i></b>")
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
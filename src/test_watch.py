@@ -0,0 +1,92 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from watch import changed_paths, snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        self.page = self.write("content/blog/index.md", "# Blog")
+        self.write("template.html", "{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_snapshot_lists_files_and_directories(self):
+        state = snapshot([self.content, self.template])
+        self.assertEqual(sorted(state.files), sorted([self.page, self.template]))
+        self.assertIn(os.path.join(self.content, "blog"), state.dirs)
+
+    def test_changed_paths(self):
+        old = snapshot([self.content, self.template])
+        self.write("content/blog/index.md", "# Blog, edited")
+        added = self.write("content/new/index.md", "# New")
+        os.remove(self.template)
+
+        new = snapshot([self.content, self.template], old)
+
+        self.assertEqual(changed_paths(old, new), {self.page, added, self.template})
+        self.assertEqual(changed_paths(new, snapshot([self.content, self.template], new)), set())
+
+
+class TestWatchSite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("content")
+        os.makedirs("static")
+        self.write(main.template_path, "{{ Content }}")
+        self.write("content/index.md", "# Home")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read_output(self):
+        with open("docs/index.html", encoding="utf-8") as f:
+            return f.read()
+
+    def test_rebuild_survives_template_missing_for_a_moment(self):
+        page = os.path.join(main.dir_path_content, "index.md")
+
+        def edits(paths, rebuild, **kwargs):
+            # an atomic save: the template is gone while a page is edited
+            os.remove(main.template_path)
+            self.write(page, "# Home\n\nedited")
+            rebuild({main.template_path, page})
+            self.assertEqual(self.read_output(), "<div><h1>Home</h1></div>")
+
+            self.write(main.template_path, "<main>{{ Content }}</main>")
+            rebuild({main.template_path})
+
+        with mock.patch("main.watch", edits), contextlib.redirect_stdout(io.StringIO()), \
+                contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(main.watch_site(main.parse_args(["--watch"]), None), 0)
+        self.assertIn("Rebuild failed: FileNotFoundError", stderr.getvalue())
+        # the page edited during the failed rebuild is not forgotten
+        self.assertEqual(self.read_output(), "<main><div><h1>Home</h1><p>edited</p></div></main>")
+
+
+if __name__ == "__main__":
+    unittest.main()
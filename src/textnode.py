@@ -1,7 +1,44 @@
-from htmlnode import LeafNode
+from htmlnode import LeafNode, ParentNode
 
+import hashlib
+import json
 from enum import Enum
 
+_image_attributes = {}
+# identifies the attributes in render cache keys, empty while there are none
+_image_attributes_digest = ""
+
+
+def set_image_attributes(attributes):
+    """
+    Give images extra attributes, such as width, height and srcset, from now on.
+
+    Args:
+        attributes: maps an image url as written in markdown, such as
+            /images/tom.png, to the attributes its img tag gets
+
+    Returns:
+        True when the attributes differ from the ones set before, in which
+        case html rendered earlier may be out of date.
+    """
+    global _image_attributes, _image_attributes_digest
+    if attributes == _image_attributes:
+        return False
+    _image_attributes = dict(attributes)
+    _image_attributes_digest = ""
+    if attributes:
+        encoded = json.dumps(attributes, sort_keys=True).encode("utf-8")
+        _image_attributes_digest = hashlib.sha256(encoded).hexdigest()
+    return True
+
+
+def active_image_attributes():
+    return _image_attributes
+
+
+def image_attributes_digest():
+    return _image_attributes_digest
+
 
 class TextType(Enum):
     TEXT = "text"
@@ -12,10 +49,13 @@ class TextType(Enum):
     IMAGE = "image"
 
 class TextNode:
-    def __init__(self, text, text_type, url=None):
+    __slots__ = ("text", "text_type", "url", "children")
+
+    def __init__(self, text, text_type, url=None, children=None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        self.children = children
 
         """
         Initialize an TextNode.
@@ -24,15 +64,20 @@ class TextNode:
             text: the typing or content from the user
             text_type: could be common text, bold, italic, code, link or image
             url: in case there is, it's the url related to the link or image.
+            children: for bold or italic text holding more markup, the
+                TextNodes nested inside it.
         """
 
     def __eq__(self, other):
         """Check the TextNodes are the same"""
         return (self.text == other.text and 
                 self.text_type == other.text_type and 
-                self.url == other.url)
+                self.url == other.url and
+                self.children == other.children)
     
     def __repr__(self) -> str:
+        if self.children is not None:
+            return f"TextNode({self.text}, {self.text_type}, {self.url}, children: {self.children})"
         return f"TextNode({self.text}, {self.text_type}, {self.url})"
 
 def text_node_to_html_node(text_node):
@@ -40,9 +85,13 @@ def text_node_to_html_node(text_node):
         return LeafNode(None, text_node.text)
 
     if text_node.text_type == TextType.BOLD:
+        if text_node.children is not None:
+            return ParentNode("b", [text_node_to_html_node(c) for c in text_node.children])
         return LeafNode("b", text_node.text)
     
     if text_node.text_type == TextType.ITALIC:
+        if text_node.children is not None:
+            return ParentNode("i", [text_node_to_html_node(c) for c in text_node.children])
         return LeafNode("i", text_node.text)
     
     if text_node.text_type == TextType.CODE:
@@ -52,7 +101,11 @@ def text_node_to_html_node(text_node):
         return LeafNode("a", text_node.text, {"href": text_node.url})
 
     if text_node.text_type == TextType.IMAGE:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        props = {"src": text_node.url, "alt": text_node.text}
+        extra = _image_attributes.get(text_node.url)
+        if extra:
+            props.update(extra)
+        return LeafNode("img", "", props)
     
     else:
         raise Exception("text_node does not belong to types accepted.")
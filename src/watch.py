@@ -0,0 +1,120 @@
+import os
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", ["files", "dirs"])
+Snapshot.__doc__ = """Files mapped to (mtime_ns, size) and directories mapped to mtime_ns."""
+
+
+def _scan_dir(dir_path, known_dirs, files, dirs, pending):
+    try:
+        dirs[dir_path] = os.stat(dir_path).st_mtime_ns
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in known_dirs:
+                        pending.append(entry.path)
+                else:
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        dirs.pop(dir_path, None)
+
+
+def snapshot(paths, previous=None):
+    """
+    Record every file under paths with its (mtime_ns, size).
+
+    Args:
+        paths: files and directories to scan; missing ones are skipped
+        previous: an earlier Snapshot of the same paths. Directories whose
+            mtime has not changed are not listed again, only the files in
+            them are stat'ed, which is much cheaper than rescanning a large
+            tree on every poll.
+    """
+    files = {}
+    dirs = {}
+    pending = []
+    known_dirs = previous.dirs if previous is not None else {}
+
+    for path in paths:
+        if os.path.isdir(path):
+            if path not in known_dirs:
+                pending.append(path)
+        else:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+
+    # a directory changed within the last second may change again without
+    # its mtime moving on coarse-grained filesystems, so keep listing it
+    settled_before = time.time_ns() - 1_000_000_000
+    unchanged_dirs = set()
+    for dir_path, mtime_ns in known_dirs.items():
+        try:
+            current = os.stat(dir_path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if current == mtime_ns and current < settled_before:
+            dirs[dir_path] = mtime_ns
+            unchanged_dirs.add(dir_path)
+        else:
+            # entries were added, removed or renamed: list it again
+            _scan_dir(dir_path, known_dirs, files, dirs, pending)
+
+    if previous is not None:
+        for path in previous.files:
+            if path not in files and os.path.dirname(path) in unchanged_dirs:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+
+    while pending:
+        _scan_dir(pending.pop(), known_dirs, files, dirs, pending)
+    return Snapshot(files, dirs)
+
+
+def changed_paths(old, new):
+    """Paths added, modified or removed between two snapshots."""
+    changed = {path for path, state in new.files.items() if old.files.get(path) != state}
+    changed.update(path for path in old.files if path not in new.files)
+    return changed
+
+
+def watch(paths, on_change, interval=0.05, debounce=0.05):
+    """
+    Poll paths forever and call on_change(changed_paths) after each burst of edits.
+
+    Args:
+        paths: files and directories to watch
+        on_change: called with the set of paths that changed
+        interval: seconds between polls
+        debounce: a burst is over once no further change has been seen
+            for this many seconds, so an editor saving several files
+            triggers a single rebuild
+    """
+    state = snapshot(paths)
+    while True:
+        time.sleep(interval)
+        current = snapshot(paths, state)
+        changed = changed_paths(state, current)
+        if not changed:
+            state = current
+            continue
+
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < debounce:
+            time.sleep(interval)
+            latest = snapshot(paths, current)
+            more = changed_paths(current, latest)
+            if more:
+                changed |= more
+                current = latest
+                quiet_since = time.monotonic()
+
+        state = current
+        on_change(changed)